@@ -0,0 +1,105 @@
+"""Multi-process write-contention benchmark for the habit tracker.
+
+Starts N writer processes against one database file. Each writer marks its
+own habits done through ``HabitDatabase.mark_habit_done``, so every call is a
+real insert competing for the write lock. Reports successful writes per
+second and the lock-wait metrics collected by ``HabitDatabase.lock_stats``.
+
+Usage:
+    python benchmarks/contention.py --writers 1,2,4,8,16,32,64 --writes 200
+"""
+
+from __future__ import annotations
+
+import argparse
+import multiprocessing
+import sqlite3
+import tempfile
+import time
+from dataclasses import asdict
+from pathlib import Path
+from typing import Dict, List
+
+from habit.db import HabitDatabase
+
+
+def _writer(db_path: Path, writer: int, writes: int, barrier, results) -> None:
+    """Mark ``writes`` habits done and report counts and lock metrics."""
+    db = HabitDatabase(db_path)
+    db._get_connection()
+    ok = failed = 0
+    barrier.wait()
+    started = time.monotonic()
+    for index in range(writes):
+        try:
+            db.mark_habit_done(f"writer-{writer}-{index}")
+            ok += 1
+        except sqlite3.OperationalError:
+            failed += 1
+    elapsed = time.monotonic() - started
+    db.close()
+    results.put({"ok": ok, "failed": failed, "elapsed": elapsed, **asdict(db.lock_stats)})
+
+
+def run(writers: int, writes: int, directory: Path) -> Dict[str, float]:
+    """Run one round with ``writers`` concurrent processes.
+
+    Returns:
+        Aggregate metrics for the round.
+    """
+    db_path = directory / f"contention-{writers}.db"
+    with HabitDatabase(db_path) as db:
+        db.init_database()
+        conn = db._get_connection()
+        conn.executemany(
+            "INSERT INTO habits (name) VALUES (?)",
+            ((f"writer-{w}-{i}",) for w in range(writers) for i in range(writes))
+        )
+        conn.commit()
+
+    barrier = multiprocessing.Barrier(writers)
+    results: multiprocessing.Queue = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(target=_writer, args=(db_path, w, writes, barrier, results))
+        for w in range(writers)
+    ]
+    for process in processes:
+        process.start()
+    reports: List[Dict[str, float]] = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    wall = max(report["elapsed"] for report in reports)
+    ok = sum(report["ok"] for report in reports)
+    transactions = sum(report["transactions"] for report in reports) or 1
+    return {
+        "writers": writers,
+        "ok": ok,
+        "failed": sum(report["failed"] for report in reports),
+        "writes_per_sec": ok / wall if wall else 0.0,
+        "mean_wait_ms": sum(report["wait_seconds"] for report in reports) / transactions * 1000,
+        "max_wait_ms": max(report["max_wait_seconds"] for report in reports) * 1000,
+        "retries": sum(report["retries"] for report in reports),
+    }
+
+
+def main() -> None:
+    """Parse arguments and print one result line per writer count."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--writers", default="1,2,4,8,16,32,64",
+                        help="Comma-separated numbers of concurrent writer processes")
+    parser.add_argument("--writes", type=int, default=200, help="Writes per writer process")
+    args = parser.parse_args()
+
+    print(f"{'writers':>7} {'ok':>7} {'failed':>6} {'writes/s':>9} "
+          f"{'mean wait ms':>12} {'max wait ms':>11} {'retries':>8}")
+    with tempfile.TemporaryDirectory() as directory:
+        for writers in (int(part) for part in args.writers.split(",")):
+            result = run(writers, args.writes, Path(directory))
+            print(f"{result['writers']:>7} {result['ok']:>7} {result['failed']:>6} "
+                  f"{result['writes_per_sec']:>9.0f} {result['mean_wait_ms']:>12.2f} "
+                  f"{result['max_wait_ms']:>11.1f} {result['retries']:>8}")
+
+
+if __name__ == "__main__":
+    main()
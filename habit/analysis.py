@@ -0,0 +1,135 @@
+"""Co-occurrence and correlation analysis across habits.
+
+Requires numpy, installed with ``pip install "habit-tracker[analysis]"``.
+"""
+
+from __future__ import annotations
+
+from datetime import date
+from typing import List, Tuple
+
+import numpy as np
+
+from .db import HabitDatabase
+from .models import HabitPair
+
+# Habits per block when computing the habit x habit matrix, bounding memory
+# to BLOCK_SIZE x habits values at a time.
+BLOCK_SIZE = 1024
+
+
+def completion_matrix(
+    db: HabitDatabase, start: date, end: date
+) -> Tuple[List[int], List[str], np.ndarray]:
+    """Build a habits x days completion matrix from one scan of ``entries``.
+    
+    Args:
+        db: Database to read.
+        start: First day (column 0).
+        end: Last day, inclusive.
+    
+    Returns:
+        Habit IDs and names in name order, and a boolean matrix whose row
+        ``i`` column ``d`` is True if habit ``i`` was done on ``start + d``.
+    """
+    habits = [*db.iter_habits()]
+    ids = [habit.id for habit in habits]
+    names = [habit.name for habit in habits]
+    
+    # Map habit IDs to matrix rows with a lookup array instead of a dict
+    lookup = np.full(max(ids, default=0) + 1, -1, dtype=np.int64)
+    lookup[ids] = np.arange(len(ids))
+    
+    cells = np.array(db.completion_offsets(start, end), dtype=np.int64).reshape(-1, 2)
+    matrix = np.zeros((len(ids), (end - start).days + 1), dtype=bool)
+    rows = lookup[cells[:, 0]]
+    known = rows >= 0
+    matrix[rows[known], cells[known, 1]] = True
+    return ids, names, matrix
+
+
+def correlate(
+    db: HabitDatabase,
+    start: date,
+    end: date,
+    lag: int = 0,
+    top: int = 10,
+    min_together: int = 1,
+) -> List[HabitPair]:
+    """Find the habit pairs whose completions are most strongly correlated.
+    
+    Co-occurrence counts for every pair come from one matrix product of the
+    completion matrix with its (shifted) transpose, and phi coefficients are
+    derived from those counts with array arithmetic.
+    
+    Args:
+        db: Database to read.
+        start: First day of the window.
+        end: Last day of the window, inclusive.
+        lag: Days between the first and second habit. With ``lag=1`` a
+            pair means "doing the first predicts the second the next day".
+        top: Number of pairs to return.
+        min_together: Ignore pairs done together on fewer days than this.
+    
+    Returns:
+        Up to ``top`` pairs, strongest positive correlation first.
+    
+    Raises:
+        ValueError: If the lag is negative, the window is not longer than
+            the lag, or ``top`` is less than 1.
+    """
+    days = (end - start).days + 1
+    if lag < 0:
+        raise ValueError("Lag must not be negative")
+    if days <= lag:
+        raise ValueError("The window must be longer than the lag")
+    if top < 1:
+        raise ValueError("Top must be at least 1")
+    
+    _, names, matrix = completion_matrix(db, start, end)
+    first = matrix[:, :days - lag].astype(np.float32)
+    second = matrix[:, lag:].astype(np.float32)
+    n = float(days - lag)
+    first_counts = first.sum(axis=1, dtype=np.float64)
+    second_counts = second.sum(axis=1, dtype=np.float64)
+    second_spread = second_counts * (n - second_counts)
+    
+    best_phi = np.empty(0, dtype=np.float64)
+    best_pairs = np.empty((0, 3), dtype=np.int64)
+    for block in range(0, len(names), BLOCK_SIZE):
+        rows = slice(block, block + BLOCK_SIZE)
+        # float32 products are exact for counts below 2**24 days
+        together = (first[rows] @ second.T).astype(np.float64)
+        spread = np.sqrt(
+            np.outer(first_counts[rows] * (n - first_counts[rows]), second_spread)
+        )
+        with np.errstate(divide="ignore", invalid="ignore"):
+            phi = (n * together - np.outer(first_counts[rows], second_counts)) / spread
+        
+        # Drop undefined (never or always done), rare and self/duplicate pairs
+        i, j = np.indices(phi.shape)
+        i += block
+        valid = (spread > 0) & (together >= min_together) & (i != j)
+        if lag == 0:
+            valid &= i < j
+        candidates = np.flatnonzero(valid)
+        if len(candidates) > top:
+            candidates = candidates[np.argpartition(-phi.flat[candidates], top - 1)[:top]]
+        
+        best_phi = np.concatenate([best_phi, phi.flat[candidates]])
+        best_pairs = np.concatenate([best_pairs, np.column_stack([
+            i.flat[candidates], j.flat[candidates], together.flat[candidates]
+        ]).astype(np.int64)])
+    
+    order = np.argsort(-best_phi, kind="stable")[:top]
+    return [
+        HabitPair(
+            first=names[best_pairs[k, 0]],
+            second=names[best_pairs[k, 1]],
+            lag=lag,
+            together=int(best_pairs[k, 2]),
+            phi=float(best_phi[k]),
+        )
+        for k in order
+    ]
+
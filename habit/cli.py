@@ -2,9 +2,58 @@
 
 from __future__ import annotations
 
+import sqlite3
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import List
+
 import click
 
-from .db import HabitDatabase
+from .db import HabitDatabase, month_keys
+from .models import ALL_WEEKDAYS, Habit
+
+
+def _complete_habit_names(
+    ctx: click.Context, param: click.Parameter, incomplete: str
+) -> List[str]:
+    """Shell-complete habit names from the name index."""
+    db = HabitDatabase()
+    if not db.db_path.exists():
+        return []
+    try:
+        return db.complete_habit_names(incomplete)
+    except sqlite3.OperationalError:
+        # Database not initialized yet
+        return []
+    finally:
+        db.close()
+
+
+def _parse_weekdays(ctx: click.Context, param: click.Parameter, value: str | None) -> int:
+    """Parse a comma-separated list of weekdays such as ``mon,wed,fri`` into a bitmask."""
+    if value is None:
+        return ALL_WEEKDAYS
+    labels = [label.lower() for label in WEEKDAY_LABELS]
+    mask = 0
+    for part in value.split(","):
+        day = part.strip().lower()[:3]
+        if day not in labels:
+            raise click.BadParameter(f"unknown weekday '{part.strip()}', expected e.g. mon,wed,fri")
+        mask |= 1 << labels.index(day)
+    return mask
+
+
+def _describe_schedule(habit: Habit) -> str:
+    """Describe a habit's schedule, e.g. ``3× per week on Mon, Wed, Fri, Sat``."""
+    days = ", ".join(
+        label for bit, label in enumerate(WEEKDAY_LABELS) if habit.weekdays >> bit & 1
+    )
+    if habit.weekly_target is None:
+        return "every day" if habit.weekdays == ALL_WEEKDAYS else f"on {days}"
+    if habit.weekdays == ALL_WEEKDAYS:
+        return f"{habit.weekly_target}× per week"
+    return f"{habit.weekly_target}× per week on {days}"
 
 
 @click.group()
@@ -27,61 +76,401 @@ def init() -> None:
 
 @main.command()
 @click.argument("name")
-def add(name: str) -> None:
+@click.option("--on", "weekdays", default=None, callback=_parse_weekdays,
+              help="Weekdays the habit is due, e.g. mon,wed,fri (default: every day)")
+@click.option("--per-week", "weekly_target", type=click.IntRange(1, 7), default=None,
+              help="Completions wanted per week instead of one every due day")
+def add(name: str, weekdays: int, weekly_target: int | None) -> None:
     """Add a new habit to track."""
     db = HabitDatabase()
     try:
-        habit = db.add_habit(name)
-        click.echo(f"✅ Added habit: {habit.name}")
-    except ValueError as e:
+        habit = db.add_habit(name, weekdays=weekdays, weekly_target=weekly_target)
+        if weekdays == ALL_WEEKDAYS and weekly_target is None:
+            click.echo(f"✅ Added habit: {habit.name}")
+        else:
+            click.echo(f"✅ Added habit: {habit.name} ({_describe_schedule(habit)})")
+    except (ValueError, sqlite3.OperationalError) as e:
         click.echo(f"❌ Error: {e}")
 
 
 @main.command()
-@click.argument("name")
+@click.argument("name", shell_complete=_complete_habit_names)
+@click.option("--on", "weekdays", default=None, callback=_parse_weekdays,
+              help="Weekdays the habit is due, e.g. mon,wed,fri (default: every day)")
+@click.option("--per-week", "weekly_target", type=click.IntRange(1, 7), default=None,
+              help="Completions wanted per week instead of one every due day")
+def schedule(name: str, weekdays: int, weekly_target: int | None) -> None:
+    """Set which days a habit is due; without options it is due every day.
+    
+    Stats count completions against this schedule.
+    """
+    db = HabitDatabase()
+    try:
+        habit = db.set_schedule(db.resolve_habit(name).name, weekdays, weekly_target)
+        click.echo(f"📅 '{habit.name}' is now due {_describe_schedule(habit)}")
+    except (ValueError, sqlite3.OperationalError) as e:
+        click.echo(f"❌ Error: {e}")
+
+
+@main.command()
+@click.argument("name", shell_complete=_complete_habit_names)
 def done(name: str) -> None:
-    """Mark a habit as completed for today."""
+    """Mark a habit as completed for today.
+    
+    NAME may be a unique prefix or a close misspelling of the habit name.
+    """
     db = HabitDatabase()
     try:
-        db.mark_habit_done(name)
-        click.echo(f"✅ Marked '{name}' as done for today!")
+        habit = db.resolve_habit(name)
+        db.mark_habit_done(habit.name)
+        click.echo(f"✅ Marked '{habit.name}' as done for today!")
+    except (ValueError, sqlite3.OperationalError) as e:
+        click.echo(f"❌ Error: {e}")
+
+
+@main.command()
+@click.argument("name", shell_complete=_complete_habit_names)
+@click.argument("amount", type=click.FloatRange(min=0, min_open=True))
+def log(name: str, amount: float) -> None:
+    """Add AMOUNT (glasses, minutes, ...) to today's total for a habit.
+    
+    NAME may be a unique prefix or a close misspelling of the habit name.
+    """
+    db = HabitDatabase()
+    try:
+        habit = db.resolve_habit(name)
+        entry = db.log_amount(habit.name, amount)
+        click.echo(f"📝 Logged {amount:g} for '{habit.name}' ({entry.value:g} today)")
+    except (ValueError, sqlite3.OperationalError) as e:
+        click.echo(f"❌ Error: {e}")
+
+
+@main.command()
+@click.argument("names", nargs=-1, shell_complete=_complete_habit_names)
+@click.option("--glob", "pattern", default=None, help="Also remove habits matching this glob, e.g. 'Read*'")
+@click.option("--vacuum", is_flag=True, help="Reclaim freed disk space afterwards")
+@click.option("--yes", is_flag=True, help="Don't ask for confirmation")
+def remove(names: tuple[str, ...], pattern: str | None, vacuum: bool, yes: bool) -> None:
+    """Remove habits and their full history.
+    
+    Each NAME may be a unique prefix or a close misspelling of a habit name.
+    With --yes, misspellings are not matched, since there is no prompt to
+    show what they resolved to.
+    """
+    if not names and pattern is None:
+        click.echo("❌ Error: Give at least one habit name or --glob pattern")
+        return
+    
+    db = HabitDatabase()
+    try:
+        resolved = tuple(db.resolve_habit(name, fuzzy=not yes).name for name in names)
     except ValueError as e:
         click.echo(f"❌ Error: {e}")
+        return
+    
+    if not yes:
+        targets = ", ".join([*resolved, *([f"habits matching '{pattern}'"] if pattern else [])])
+        click.confirm(f"Remove {targets} and all their entries?", abort=True)
+    
+    try:
+        removed = db.remove_habits(resolved, pattern=pattern, vacuum=vacuum)
+    except (ValueError, sqlite3.OperationalError) as e:
+        click.echo(f"❌ Error: {e}")
+        return
+    
+    if not removed:
+        click.echo("No matching habits found.")
+    for name in removed:
+        click.echo(f"🗑️ Removed habit: {name}")
 
 
 @main.command()
-@click.option("--all", "show_all", is_flag=True, help="Show all habits, not just today's status")
-def list(show_all: bool) -> None:
+@click.option("--all", "show_all", is_flag=True, hidden=True,
+              help="Deprecated; every habit is always listed")
+@click.option("--limit", type=click.IntRange(min=1), default=None,
+              help="Show at most this many habits")
+@click.option("--after", default=None, help="Only show habits whose name sorts after this one")
+def list(show_all: bool, limit: int | None, after: str | None) -> None:
     """List habits and their status."""
+    if show_all:
+        click.echo("⚠️ --all is deprecated and has no effect; every habit is always listed", err=True)
     db = HabitDatabase()
-    habits = db.list_habits(show_all=show_all)
+    found = False
     
-    if not habits:
-        click.echo("No habits found. Use 'habit add <name>' to create your first habit.")
+    try:
+        for habit in db.iter_habits(after=after, limit=limit):
+            found = True
+            status = "✔️" if habit.completed_today else "❌"
+            click.echo(f"{status} {habit.name}")
+    except (ValueError, sqlite3.OperationalError) as e:
+        click.echo(f"❌ Error: {e}")
         return
     
-    for habit in habits:
-        status = "✔️" if habit.completed_today else "❌"
-        click.echo(f"{status} {habit.name}")
+    if not found:
+        click.echo("No habits found. Use 'habit add <name>' to create your first habit.")
+
+
+WEEKDAY_LABELS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+
+
+def _parse_windows(ctx: click.Context, param: click.Parameter, value: str) -> tuple[int, ...]:
+    """Parse a comma-separated list of day windows such as ``7,30,90``."""
+    try:
+        windows = tuple(int(part) for part in value.split(",") if part.strip())
+    except ValueError:
+        raise click.BadParameter("expected comma-separated whole numbers, e.g. 7,30,90")
+    if not windows or any(days <= 0 for days in windows):
+        raise click.BadParameter("windows must be positive numbers of days")
+    return windows
 
 
 @main.command()
-@click.option("--days", default=7, help="Number of days to show stats for")
-def stats(days: int) -> None:
+@click.option("--days", default="7", callback=_parse_windows,
+              help="Number of days to show stats for; comma-separate for several windows")
+@click.option("--limit", type=click.IntRange(min=1), default=None,
+              help="Show at most this many habits")
+@click.option("--after", default=None, help="Only show habits whose name sorts after this one")
+@click.option("--breakdown", type=click.Choice(["weekday", "month"]), default=None,
+              help="Also show completions per weekday or per month")
+@click.option("--habit", "habit_names", multiple=True, shell_complete=_complete_habit_names,
+              help="Only show this habit (prefix or close spelling); repeatable")
+def stats(days: tuple[int, ...], limit: int | None, after: str | None,
+          breakdown: str | None, habit_names: tuple[str, ...]) -> None:
     """Show completion statistics for habits."""
     db = HabitDatabase()
-    stats_data = db.get_stats(days)
+    found = False
+    names = None
+    if habit_names:
+        try:
+            names = [db.resolve_habit(name).name for name in habit_names]
+        except ValueError as e:
+            click.echo(f"❌ Error: {e}")
+            return
+    end_date = date.today()
+    months = month_keys(end_date - timedelta(days=max(days) - 1), end_date)
+    
+    for row in db.iter_stats(days, after=after, limit=limit, names=names):
+        if not found:
+            click.echo(f"📊 Stats for the last {'/'.join(map(str, days))} days:")
+            found = True
+        bar_length = 20
+        filled = int(bar_length * row.rates[0] / 100)
+        bar = "█" * filled + "░" * (bar_length - filled)
+        if len(days) == 1:
+            click.echo(f"{row.name}: {bar} {row.rates[0]:.1f}%")
+        else:
+            rates = "  ".join(f"{window}d {rate:.1f}%" for window, rate in zip(days, row.rates))
+            click.echo(f"{row.name}: {bar} {rates}")
+        
+        if breakdown == "weekday":
+            click.echo("    " + "  ".join(
+                f"{label} {count}" for label, count in zip(WEEKDAY_LABELS, row.weekdays)
+            ))
+        elif breakdown == "month":
+            click.echo("    " + "  ".join(
+                f"{month} {count}" for month, count in zip(months, row.months)
+            ))
     
-    if not stats_data:
+    if not found:
+        click.echo("No habits found. Use 'habit add <name>' to create your first habit.")
+
+
+@main.command()
+@click.argument("names", nargs=-1, shell_complete=_complete_habit_names)
+@click.option("--days", default=30, type=click.IntRange(min=1),
+              help="Number of days to total, ending today")
+def values(names: tuple[str, ...], days: int) -> None:
+    """Show totals and averages of logged amounts, with all-time percentiles.
+    
+    Shows every habit unless NAMES are given. Totals and averages cover the
+    last --days days; percentiles cover all logged days.
+    """
+    db = HabitDatabase()
+    try:
+        habits = [db.resolve_habit(name) for name in names] if names else [*db.iter_habits()]
+    except (ValueError, sqlite3.OperationalError) as e:
+        click.echo(f"❌ Error: {e}")
+        return
+    if not habits:
         click.echo("No habits found. Use 'habit add <name>' to create your first habit.")
         return
     
-    click.echo(f"📊 Stats for the last {days} days:")
-    for habit_name, completion_rate in stats_data:
-        bar_length = 20
-        filled = int(bar_length * completion_rate / 100)
-        bar = "█" * filled + "░" * (bar_length - filled)
-        click.echo(f"{habit_name}: {bar} {completion_rate:.1f}%")
+    end_date = date.today()
+    start_date = end_date - timedelta(days=days - 1)
+    click.echo(f"📈 Amounts for the last {days} days:")
+    for offset in range(0, len(habits), 500):
+        chunk = habits[offset:offset + 500]
+        ids = [h.id for h in chunk]
+        for habit, stats, percentiles in zip(
+            chunk, db.value_stats(ids, start_date, end_date), db.value_percentiles(ids)
+        ):
+            if stats.average is None:
+                line = f"{habit.name}: nothing logged"
+            else:
+                line = (f"{habit.name}: {stats.total:g} total, {stats.average:.1f} per day "
+                        f"over {stats.days} logged days")
+            if percentiles:
+                line += " · all-time " + ", ".join(
+                    f"p{p} {value:g}" for p, value in percentiles.items()
+                )
+            click.echo(line)
+
+
+@main.command()
+@click.option("--since", "cursor", default=0, help="Only show changes after this sequence number")
+@click.option("--limit", default=500, type=click.IntRange(min=1),
+              help="Maximum number of changes to fetch per batch")
+@click.option("--follow", is_flag=True, help="Keep waiting for and printing new changes")
+@click.option("--interval", default=1.0, type=click.FloatRange(min=0, min_open=True),
+              help="Seconds between checks with --follow")
+def changes(cursor: int, limit: int, follow: bool, interval: float) -> None:
+    """Print the change log as tab-separated rows.
+    
+    Columns are sequence number, operation, habit ID, habit name, entry
+    date and the entry's amount after the change. Resume later with --since
+    set to the last sequence number printed.
+    """
+    db = HabitDatabase()
+    
+    try:
+        while True:
+            # Read before querying so a commit made meanwhile is not missed
+            version = db.data_version()
+            batch = db.changes_since(cursor, limit)
+            for change in batch:
+                entry_date = change.entry_date.isoformat() if change.entry_date else ""
+                value = f"{change.value:g}" if change.value is not None else ""
+                click.echo(
+                    f"{change.seq}\t{change.op}\t{change.habit_id}\t{change.habit_name}"
+                    f"\t{entry_date}\t{value}"
+                )
+                cursor = change.seq
+            if len(batch) == limit:
+                continue
+            if not follow:
+                return
+            
+            # Only query the log again once another connection has committed
+            while db.data_version() == version:
+                time.sleep(interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        db.close()
+
+
+@main.command()
+@click.argument("first", type=click.Path(exists=True, dir_okay=False, path_type=Path))
+@click.argument("second", type=click.Path(exists=True, dir_okay=False, path_type=Path))
+def sync(first: Path, second: Path) -> None:
+    """Merge two habit databases so both hold every habit and entry.
+    
+    Habits are matched by name. Only rows added or updated since the
+    previous sync of the same two files are copied; when both files hold an
+    entry for the same day, the larger amount wins.
+    """
+    with HabitDatabase(first) as db:
+        try:
+            result = db.sync_with(second)
+        except (ValueError, sqlite3.Error) as e:
+            click.echo(f"❌ Error: {e}")
+            return
+    
+    click.echo(f"🔄 Synced {first} ↔ {second}")
+    click.echo(f"  {first}: +{result.habits_pulled} habits, +{result.entries_pulled} entries")
+    click.echo(f"  {second}: +{result.habits_pushed} habits, +{result.entries_pushed} entries")
+
+
+@main.command()
+@click.option("--days", default=90, help="Number of days to analyse, ending today")
+@click.option("--start", type=click.DateTime(formats=["%Y-%m-%d"]), default=None,
+              help="First day to analyse (overrides --days)")
+@click.option("--end", type=click.DateTime(formats=["%Y-%m-%d"]), default=None,
+              help="Last day to analyse (default: today)")
+@click.option("--lag", default=0, type=click.IntRange(min=0),
+              help="Days between the two habits, e.g. 1 for 'X predicts Y tomorrow'")
+@click.option("--top", default=10, type=click.IntRange(min=1), help="Number of pairs to show")
+@click.option("--min-together", default=1, type=click.IntRange(min=1),
+              help="Ignore pairs done together on fewer days than this")
+def correlate(days: int, start: datetime | None, end: datetime | None, lag: int,
+              top: int, min_together: int) -> None:
+    """Show which habits tend to be completed together."""
+    try:
+        from .analysis import correlate as correlate_habits
+    except ImportError:
+        click.echo("❌ Error: correlate needs numpy: pip install \"habit-tracker[analysis]\"")
+        return
+    
+    end_date = end.date() if end else date.today()
+    start_date = start.date() if start else end_date - timedelta(days=days - 1)
+    db = HabitDatabase()
+    try:
+        pairs = correlate_habits(db, start_date, end_date, lag=lag, top=top,
+                                 min_together=min_together)
+    except ValueError as e:
+        click.echo(f"❌ Error: {e}")
+        return
+    
+    if not pairs:
+        click.echo("No correlated habits found.")
+        return
+    
+    click.echo(f"🔗 Correlations from {start_date} to {end_date}:")
+    for pair in pairs:
+        link = "↔" if lag == 0 else f"→ (+{lag}d)"
+        click.echo(f"{pair.first} {link} {pair.second}: φ={pair.phi:+.2f} "
+                   f"({pair.together} days)")
+
+
+@main.command()
+@click.argument("path", type=click.Path(file_okay=False, path_type=Path),
+                default="habit-snapshot")
+@click.option("--format", "fmt", type=click.Choice(["npy"]), default="npy",
+              help="Snapshot format")
+@click.option("--start", type=click.DateTime(formats=["%Y-%m-%d"]), default=None,
+              help="First day (default: the existing snapshot's, or the earliest entry)")
+def snapshot(path: Path, fmt: str, start: datetime | None) -> None:
+    """Write a columnar snapshot of all habits for data analysis.
+    
+    Re-running it on the same directory appends only the new days.
+    """
+    try:
+        from .snapshot import write_snapshot
+    except ImportError:
+        click.echo("❌ Error: snapshot needs numpy: pip install \"habit-tracker[analysis]\"")
+        return
+    
+    with HabitDatabase() as db:
+        try:
+            result = write_snapshot(db, path, start=start.date() if start else None)
+        except ValueError as e:
+            click.echo(f"❌ Error: {e}")
+            return
+    
+    days = (result.end - result.start).days + 1
+    action = "Rebuilt" if result.rebuilt else f"Updated ({result.days_written} days written)"
+    click.echo(f"📦 {action} {path}: {result.habits} habits × {days} days "
+               f"from {result.start} to {result.end}")
+
+
+@main.command()
+@click.option("--days", default=7, type=click.IntRange(min=1),
+              help="Number of days to show per habit")
+def tui(days: int) -> None:
+    """Open a live-refreshing dashboard of all habits."""
+    try:
+        import curses
+        
+        from .tui import run
+    except ImportError:
+        click.echo("❌ Error: The dashboard needs the curses module, which is not available here")
+        return
+    
+    db = HabitDatabase()
+    try:
+        curses.wrapper(run, db, days)
+    finally:
+        db.close()
 
 
 if __name__ == "__main__":
@@ -2,12 +2,80 @@
 
 from __future__ import annotations
 
+import difflib
+import random
 import sqlite3
+import time
+import uuid
+import warnings
+from contextlib import contextmanager
 from datetime import date, datetime, timedelta
 from pathlib import Path
-from typing import List, Optional, Tuple
+from typing import Dict, Iterator, List, Optional, Sequence, Set, Tuple, Union
 
-from .models import Habit, Entry
+from .models import (
+    ALL_WEEKDAYS, Change, Habit, Entry, LockStats, StatsRow, StatsTable, SyncResult,
+    ValueStats, check_schedule, check_windows,
+)
+
+# Seconds SQLite's own busy handler waits on a lock for reads and commits.
+BUSY_TIMEOUT = 5.0
+
+# Write-lock acquisition: total seconds to keep retrying, and the bounds of
+# the exponential backoff between attempts (each sleep is jittered).
+LOCK_TIMEOUT = 30.0
+LOCK_BACKOFF_MIN = 0.001
+LOCK_BACKOFF_MAX = 0.1
+
+# Number of rows fetched per keyset page by the ``iter_*`` generators.
+PAGE_SIZE = 500
+
+# Number of rows deleted per transaction by ``remove_habits``.
+DELETE_CHUNK_SIZE = 5000
+
+ENTRIES_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS {table} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        habit_id INTEGER NOT NULL,
+        entry_date DATE NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (habit_id) REFERENCES habits (id) ON DELETE CASCADE,
+        UNIQUE(habit_id, entry_date)
+    )
+"""
+
+# Fuzzy name resolution: trigram candidates examined and minimum similarity.
+FUZZY_CANDIDATES = 20
+FUZZY_CUTOFF = 0.6
+# Trigrams shared by more habits than this (e.g. the "hab" of many "habit
+# NNN" names) are skipped when gathering candidates, bounding the rows read.
+FUZZY_COMMON_TRIGRAM = 100
+
+# Sorts after any character a habit name can contain; used as the upper
+# bound of a prefix range scan on the habits.name index.
+_PREFIX_END = chr(0x10FFFF)
+
+# Schedule columns added to habits after its first release.
+_SCHEDULE_COLUMNS = {
+    "weekdays": f"INTEGER NOT NULL DEFAULT {ALL_WEEKDAYS} CHECK (weekdays BETWEEN 1 AND {ALL_WEEKDAYS})",
+    "weekly_target": "INTEGER CHECK (weekly_target BETWEEN 1 AND 7)",
+}
+
+
+def name_trigrams(name: str) -> Set[str]:
+    """Return the lower-cased, space-padded trigrams of a habit name."""
+    padded = f"  {name.lower()} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def month_keys(start: date, end: date) -> List[str]:
+    """Return the ``YYYY-MM`` keys of every month between two dates."""
+    keys = []
+    year, month = start.year, start.month
+    while (year, month) <= (end.year, end.month):
+        keys.append(f"{year:04d}-{month:02d}")
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return keys
 
 
 class HabitDatabase:
@@ -21,18 +89,80 @@ class HabitDatabase:
         """
         self.db_path = db_path or Path("habits.db")
         self.connection: Optional[sqlite3.Connection] = None
+        self.lock_stats = LockStats()
     
     def _get_connection(self) -> sqlite3.Connection:
         """Get database connection, creating it if necessary."""
         if self.connection is None:
-            self.connection = sqlite3.connect(str(self.db_path))
+            self.connection = sqlite3.connect(str(self.db_path), timeout=BUSY_TIMEOUT)
             self.connection.row_factory = sqlite3.Row
+            self.connection.execute("PRAGMA foreign_keys = ON")
         return self.connection
     
+    @contextmanager
+    def _write_transaction(self) -> Iterator[sqlite3.Connection]:
+        """Run a block inside a ``BEGIN IMMEDIATE`` transaction.
+        
+        The write lock is taken up front, so a read followed by a write in
+        the block can't fail upgrading its lock. While another connection
+        holds the lock, acquisition is retried with jittered exponential
+        backoff for up to ``LOCK_TIMEOUT`` seconds, and the wait is recorded
+        in ``lock_stats``. Commits if the block succeeds, rolls back if not.
+        
+        Raises:
+            sqlite3.OperationalError: If the lock can't be taken in time.
+        """
+        conn = self._get_connection()
+        if conn.in_transaction:
+            conn.commit()
+        
+        started = time.monotonic()
+        delay = LOCK_BACKOFF_MIN
+        retries = 0
+        # Retry here instead of in SQLite's busy handler, which sleeps on a
+        # fixed schedule and lets waiting writers wake up in lockstep
+        conn.execute("PRAGMA busy_timeout = 0")
+        try:
+            while True:
+                try:
+                    conn.execute("BEGIN IMMEDIATE")
+                    break
+                except sqlite3.OperationalError as e:
+                    locked = "locked" in str(e) or "busy" in str(e)
+                    if not locked or time.monotonic() - started + delay > LOCK_TIMEOUT:
+                        self.lock_stats.failures += 1
+                        raise
+                    retries += 1
+                    time.sleep(random.uniform(0, delay))
+                    delay = min(delay * 2, LOCK_BACKOFF_MAX)
+        finally:
+            conn.execute(f"PRAGMA busy_timeout = {int(BUSY_TIMEOUT * 1000)}")
+        
+        waited = time.monotonic() - started
+        self.lock_stats.transactions += 1
+        self.lock_stats.retries += retries
+        self.lock_stats.wait_seconds += waited
+        self.lock_stats.max_wait_seconds = max(self.lock_stats.max_wait_seconds, waited)
+        
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+    
     def init_database(self) -> None:
         """Initialize the database with required tables."""
         conn = self._get_connection()
         
+        # Let remove_habits hand freed pages back to the OS. Only takes
+        # effect on a new, empty database file.
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        
+        # Readers don't block the writer (or vice versa) in WAL mode, and
+        # commits are cheaper, which helps many short-lived writers
+        conn.execute("PRAGMA journal_mode = WAL")
+        
         # Create habits table
         conn.execute("""
             CREATE TABLE IF NOT EXISTS habits (
@@ -42,47 +172,229 @@ class HabitDatabase:
             )
         """)
         
+        # Add schedule columns here rather than in CREATE TABLE so that
+        # habits tables created before schedules gain them too
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(habits)")}
+        for column, definition in _SCHEDULE_COLUMNS.items():
+            if column not in columns:
+                conn.execute(f"ALTER TABLE habits ADD COLUMN {column} {definition}")
+        
         # Create entries table
+        conn.execute(ENTRIES_TABLE_SQL.format(table="entries"))
+        
+        # Databases created before entries cascaded on habit deletion need
+        # their entries table rebuilt, as SQLite cannot alter a foreign key
+        foreign_keys = conn.execute("PRAGMA foreign_key_list(entries)").fetchall()
+        if any(fk["on_delete"] != "CASCADE" for fk in foreign_keys):
+            conn.commit()
+            conn.execute("BEGIN")
+            conn.execute(ENTRIES_TABLE_SQL.format(table="entries_new"))
+            conn.execute("INSERT INTO entries_new SELECT * FROM entries")
+            conn.execute("DROP TABLE entries")
+            conn.execute("ALTER TABLE entries_new RENAME TO entries")
+            conn.commit()
+        
+        # Add the logged amount to entries created before quantities; a
+        # plain "done" entry counts as 1
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(entries)")}
+        if "value" not in columns:
+            conn.execute(
+                "ALTER TABLE entries ADD COLUMN value REAL NOT NULL DEFAULT 1 CHECK (value > 0)"
+            )
+        
+        # Prefix-sum indexes from before quantities lack the running value
+        # sum; they only hold derived data, so drop them and rebuild below
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(entry_counts)")}
+        if columns and "cumulative_value" not in columns:
+            conn.execute("DROP TABLE entry_counts")
+        
+        # Create prefix-sum index: running count and amount of entries per
+        # habit, so a range count or sum is the difference of two lookups
         conn.execute("""
-            CREATE TABLE IF NOT EXISTS entries (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
+            CREATE TABLE IF NOT EXISTS entry_counts (
                 habit_id INTEGER NOT NULL,
                 entry_date DATE NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (habit_id) REFERENCES habits (id),
-                UNIQUE(habit_id, entry_date)
+                cumulative INTEGER NOT NULL,
+                cumulative_value REAL NOT NULL,
+                PRIMARY KEY (habit_id, entry_date)
+            ) WITHOUT ROWID
+        """)
+        
+        # Create histogram of daily amounts per habit, for percentiles
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS entry_values (
+                habit_id INTEGER NOT NULL,
+                value REAL NOT NULL,
+                days INTEGER NOT NULL,
+                PRIMARY KEY (habit_id, value)
+            ) WITHOUT ROWID
+        """)
+        
+        # Create trigram index over habit names for fuzzy resolution
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS name_trigrams (
+                trigram TEXT NOT NULL,
+                habit_id INTEGER NOT NULL,
+                FOREIGN KEY (habit_id) REFERENCES habits (id) ON DELETE CASCADE,
+                PRIMARY KEY (trigram, habit_id)
+            ) WITHOUT ROWID
+        """)
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_name_trigrams_habit ON name_trigrams (habit_id)"
+        )
+        for row in conn.execute("""
+            SELECT id, name FROM habits
+            WHERE id NOT IN (SELECT habit_id FROM name_trigrams)
+        """).fetchall():
+            self._index_name(row["id"], row["name"])
+        
+        # Backfill the entry aggregates for databases created before them
+        indexed, histogram, entries = conn.execute("""
+            SELECT (SELECT COUNT(*) FROM entry_counts),
+                   (SELECT COALESCE(SUM(days), 0) FROM entry_values),
+                   (SELECT COUNT(*) FROM entries)
+        """).fetchone()
+        if not indexed == histogram == entries:
+            self.rebuild_entry_counts()
+        
+        # Create append-only change log; seq is never reused, so consumers
+        # can resume from the last sequence number they processed
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS changes (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                op TEXT NOT NULL,
+                habit_id INTEGER NOT NULL,
+                habit_name TEXT NOT NULL,
+                entry_date DATE,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        # Entry amounts were added to the log after it was introduced
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(changes)")}
+        if "value" not in columns:
+            conn.execute("ALTER TABLE changes ADD COLUMN value REAL")
+        
+        # Create bookkeeping: a random ID for this file and a count of
+        # schedule changes, and for each sync peer the highest habit ID,
+        # entry ID and change seq already pulled from it
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
             )
         """)
+        conn.execute(
+            "INSERT OR IGNORE INTO meta (key, value) VALUES ('database_id', ?)",
+            (uuid.uuid4().hex,)
+        )
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS sync_state (
+                peer_id TEXT PRIMARY KEY,
+                habit_watermark INTEGER NOT NULL DEFAULT 0,
+                entry_watermark INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(sync_state)")}
+        if "change_watermark" not in columns:
+            conn.execute(
+                "ALTER TABLE sync_state ADD COLUMN change_watermark INTEGER NOT NULL DEFAULT 0"
+            )
+        
+        # Seed the log with existing rows for databases created before it
+        if conn.execute("SELECT 1 FROM changes LIMIT 1").fetchone() is None:
+            conn.execute("""
+                INSERT INTO changes (op, habit_id, habit_name, entry_date, value, created_at)
+                SELECT op, habit_id, habit_name, entry_date, value, created_at FROM (
+                    SELECT 'habit_added' as op, id as habit_id, name as habit_name,
+                           NULL as entry_date, NULL as value, created_at, 0 as kind,
+                           id as row_id
+                    FROM habits
+                    UNION ALL
+                    SELECT 'entry_added', e.habit_id, h.name, e.entry_date, e.value,
+                           e.created_at, 1, e.id
+                    FROM entries e JOIN habits h ON h.id = e.habit_id
+                )
+                ORDER BY created_at, kind, row_id
+            """)
         
         conn.commit()
     
-    def add_habit(self, name: str) -> Habit:
+    def add_habit(
+        self, name: str, weekdays: int = ALL_WEEKDAYS, weekly_target: Optional[int] = None
+    ) -> Habit:
         """Add a new habit to the database.
         
         Args:
             name: Name of the habit to add.
+            weekdays: Bitmask of weekdays the habit is due on, bit 0 for Monday.
+            weekly_target: Completions wanted per week, or None to want one
+                on every due weekday.
             
         Returns:
             The created Habit object.
             
         Raises:
-            ValueError: If habit with this name already exists.
+            ValueError: If habit with this name already exists, or the
+                schedule is invalid.
         """
-        conn = self._get_connection()
-        
+        check_schedule(weekdays, weekly_target)
         try:
-            cursor = conn.execute(
-                "INSERT INTO habits (name) VALUES (?)",
-                (name,)
-            )
-            habit_id = cursor.lastrowid
-            if habit_id is None:
-                raise RuntimeError("Failed to get habit ID from database")
-            conn.commit()
-            
-            return Habit(id=habit_id, name=name, created_at=datetime.now())
+            with self._write_transaction() as conn:
+                cursor = conn.execute(
+                    "INSERT INTO habits (name, weekdays, weekly_target) VALUES (?, ?, ?)",
+                    (name, weekdays, weekly_target)
+                )
+                habit_id = cursor.lastrowid
+                if habit_id is None:
+                    raise RuntimeError("Failed to get habit ID from database")
+                self._index_name(habit_id, name)
+                self._log_change("habit_added", habit_id, name)
         except sqlite3.IntegrityError:
             raise ValueError(f"Habit '{name}' already exists")
+        
+        return Habit(
+            id=habit_id,
+            name=name,
+            created_at=datetime.now(),
+            weekdays=weekdays,
+            weekly_target=weekly_target,
+        )
+    
+    def set_schedule(
+        self, name: str, weekdays: int = ALL_WEEKDAYS, weekly_target: Optional[int] = None
+    ) -> Habit:
+        """Change which days a habit is due on.
+        
+        Stats for past windows are recomputed against the new schedule.
+        
+        Args:
+            name: Name of the habit.
+            weekdays: Bitmask of weekdays the habit is due on, bit 0 for Monday.
+            weekly_target: Completions wanted per week, or None to want one
+                on every due weekday.
+            
+        Returns:
+            The updated Habit object.
+            
+        Raises:
+            ValueError: If habit doesn't exist, or the schedule is invalid.
+        """
+        check_schedule(weekdays, weekly_target)
+        with self._write_transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE habits SET weekdays = ?, weekly_target = ? WHERE name = ?",
+                (weekdays, weekly_target, name)
+            )
+            if cursor.rowcount == 0:
+                raise ValueError(f"Habit '{name}' not found")
+            conn.execute("""
+                INSERT INTO meta (key, value) VALUES ('schedule_version', 1)
+                ON CONFLICT (key) DO UPDATE SET value = CAST(value AS INTEGER) + 1
+            """)
+        
+        habit = self.get_habit_by_name(name)
+        assert habit is not None
+        return habit
     
     def get_habit_by_name(self, name: str) -> Optional[Habit]:
         """Get a habit by name.
@@ -102,144 +414,1294 @@ class HabitDatabase:
         if row is None:
             return None
         
-        return Habit(
-            id=row["id"],
-            name=row["name"],
-            created_at=datetime.fromisoformat(row["created_at"])
+        return self._row_to_habit(row)
+    
+    def _index_name(self, habit_id: int, name: str, schema: str = "main") -> None:
+        """Add a habit's name to the ``name_trigrams`` index. Does not commit."""
+        self._get_connection().executemany(
+            f"INSERT OR IGNORE INTO {schema}.name_trigrams (trigram, habit_id) VALUES (?, ?)",
+            ((trigram, habit_id) for trigram in name_trigrams(name))
         )
     
+    def complete_habit_names(self, prefix: str, limit: int = 20) -> List[str]:
+        """Get habit names starting with a prefix, for shell completion.
+        
+        Uses a range scan on the ``habits.name`` index, so only matching
+        names are read.
+        
+        Args:
+            prefix: Case-sensitive start of the habit name.
+            limit: Maximum number of names to return.
+            
+        Returns:
+            Matching habit names in name order.
+        """
+        conn = self._get_connection()
+        rows = conn.execute(
+            "SELECT name FROM habits WHERE name >= ? AND name < ? ORDER BY name LIMIT ?",
+            (prefix, prefix + _PREFIX_END, limit)
+        ).fetchall()
+        return [row["name"] for row in rows]
+    
+    def resolve_habit(self, query: str, fuzzy: bool = True) -> Habit:
+        """Find the habit a user meant by an exact name, prefix or typo.
+        
+        Tries, in order: the exact name, a unique case-sensitive prefix, and
+        the most similar name among candidates sharing trigrams with the
+        query in the ``name_trigrams`` index.
+        
+        Args:
+            query: Name, prefix or misspelling of a habit.
+            fuzzy: If False, only exact names and unique prefixes match,
+                e.g. for destructive commands run without confirmation.
+            
+        Returns:
+            The matching Habit object.
+            
+        Raises:
+            ValueError: If no habit matches or the match is ambiguous.
+        """
+        habit = self.get_habit_by_name(query)
+        if habit is not None:
+            return habit
+        
+        prefixed = self.complete_habit_names(query, limit=6)
+        if len(prefixed) > 1:
+            raise ValueError(f"Habit '{query}' is ambiguous: {', '.join(prefixed)}")
+        
+        if prefixed:
+            resolved = prefixed[0]
+        elif fuzzy:
+            resolved = self._closest_name(query)
+        else:
+            raise ValueError(f"Habit '{query}' not found")
+        
+        habit = self.get_habit_by_name(resolved)
+        if habit is None:
+            raise ValueError(f"Habit '{query}' not found")
+        return habit
+    
+    def _closest_name(self, query: str) -> str:
+        """Return the most similar habit name among trigram candidates.
+        
+        Raises:
+            ValueError: If no candidate is similar enough or the best match
+                is tied.
+        """
+        trigrams = sorted(name_trigrams(query))
+        conn = self._get_connection()
+        # Count each trigram's habits, stopping past the common threshold
+        counts = conn.execute(f"""
+            WITH query(trigram) AS (VALUES {", ".join(["(?)"] * len(trigrams))})
+            SELECT trigram, (
+                SELECT COUNT(*) FROM (
+                    SELECT 1 FROM name_trigrams t
+                    WHERE t.trigram = query.trigram
+                    LIMIT ?
+                )
+            )
+            FROM query
+        """, (*trigrams, FUZZY_COMMON_TRIGRAM + 1)).fetchall()
+        rare = [trigram for trigram, count in counts if 0 < count <= FUZZY_COMMON_TRIGRAM]
+        
+        rows = []
+        # If the rare trigrams are all typos, fall back to every trigram;
+        # each list is still read only up to the threshold
+        for selected in ([rare] if rare else []) + [trigrams]:
+            rows = conn.execute(f"""
+                SELECT h.name, COUNT(*) as shared
+                FROM ({" UNION ALL ".join(
+                    "SELECT * FROM (SELECT habit_id FROM name_trigrams WHERE trigram = ? LIMIT ?)"
+                    for _ in selected
+                )}) t
+                JOIN habits h ON h.id = t.habit_id
+                GROUP BY h.id, h.name
+                ORDER BY shared DESC
+                LIMIT ?
+            """, (
+                *(value for trigram in selected for value in (trigram, FUZZY_COMMON_TRIGRAM)),
+                FUZZY_CANDIDATES,
+            )).fetchall()
+            if rows:
+                break
+        
+        # Score against the whole name and against a prefix of the query's
+        # length, so misspelled prefixes resolve as well as misspelled names.
+        # The quick ratios are upper bounds of ratio(), so names that can't
+        # reach the best score so far are skipped without the full diff.
+        needle = query.lower()
+        best = FUZZY_CUTOFF
+        tied: List[str] = []
+        for row in rows:
+            # Rows come most shared first; names sharing under half as many
+            # trigrams as the best candidate are not worth a full diff
+            if row["shared"] * 2 < rows[0]["shared"]:
+                break
+            name = row["name"]
+            for target in {name.lower(), name.lower()[:len(needle)]}:
+                matcher = difflib.SequenceMatcher(None, needle, target)
+                if matcher.real_quick_ratio() < best or matcher.quick_ratio() < best:
+                    continue
+                score = matcher.ratio()
+                if score < best:
+                    continue
+                if score > best:
+                    best, tied = score, []
+                if name not in tied:
+                    tied.append(name)
+        if not tied:
+            raise ValueError(f"Habit '{query}' not found")
+        
+        if len(tied) > 1:
+            raise ValueError(f"Habit '{query}' is ambiguous: {', '.join(sorted(tied))}")
+        return tied[0]
+    
     def mark_habit_done(self, name: str) -> Entry:
         """Mark a habit as completed for today.
         
+        Marking a habit done again the same day keeps the existing entry.
+        
         Args:
             name: Name of the habit to mark as done.
             
         Returns:
-            The created Entry object.
+            Today's Entry object.
             
         Raises:
             ValueError: If habit doesn't exist.
         """
-        habit = self.get_habit_by_name(name)
-        if habit is None:
-            raise ValueError(f"Habit '{name}' not found")
-        
-        conn = self._get_connection()
         today = date.today()
         
-        try:
-            cursor = conn.execute(
-                "INSERT INTO entries (habit_id, entry_date) VALUES (?, ?)",
-                (habit.id, today)
-            )
-            entry_id = cursor.lastrowid
-            if entry_id is None:
-                raise RuntimeError("Failed to get entry ID from database")
-            conn.commit()
+        # Look the habit up inside the write transaction so a concurrent
+        # removal can't slip in between the read and the insert
+        with self._write_transaction() as conn:
+            habit = self.get_habit_by_name(name)
+            if habit is None:
+                raise ValueError(f"Habit '{name}' not found")
             
-            return Entry(
-                id=entry_id,
-                habit_id=habit.id,
-                entry_date=today,
-                created_at=datetime.now()
-            )
-        except sqlite3.IntegrityError:
-            # Entry already exists for today
+            cursor = conn.execute("""
+                INSERT INTO entries (habit_id, entry_date) VALUES (?, ?)
+                ON CONFLICT (habit_id, entry_date) DO NOTHING
+            """, (habit.id, today))
             row = conn.execute(
                 "SELECT * FROM entries WHERE habit_id = ? AND entry_date = ?",
                 (habit.id, today)
             ).fetchone()
+            if cursor.rowcount:
+                self._append_entry_count(habit.id, today)
+                self._log_change("entry_added", habit.id, habit.name, today, row["value"])
+        
+        return self._row_to_entry(row)
+    
+    def log_amount(self, name: str, amount: float) -> Entry:
+        """Add an amount, such as glasses of water or minutes read, to today.
+        
+        Amounts logged on the same day accumulate into one entry with a
+        single upsert, and the entry counts as done for completion stats.
+        
+        Args:
+            name: Name of the habit to log.
+            amount: Positive amount to add to today's total.
+            
+        Returns:
+            Today's Entry object, with the accumulated ``value``.
             
-            return Entry(
-                id=row["id"],
-                habit_id=habit.id,
-                entry_date=today,
-                created_at=datetime.fromisoformat(row["created_at"])
+        Raises:
+            ValueError: If habit doesn't exist, or the amount isn't positive.
+        """
+        if amount <= 0:
+            raise ValueError("Amount must be positive")
+        today = date.today()
+        
+        with self._write_transaction() as conn:
+            habit = self.get_habit_by_name(name)
+            if habit is None:
+                raise ValueError(f"Habit '{name}' not found")
+            
+            # The write lock is held, so the total can't change between the
+            # read of the previous total and the upsert
+            previous = conn.execute(
+                "SELECT value FROM entries WHERE habit_id = ? AND entry_date = ?",
+                (habit.id, today)
+            ).fetchone()
+            conn.execute("""
+                INSERT INTO entries (habit_id, entry_date, value) VALUES (?, ?, ?)
+                ON CONFLICT (habit_id, entry_date) DO UPDATE SET value = value + excluded.value
+            """, (habit.id, today, amount))
+            row = conn.execute(
+                "SELECT * FROM entries WHERE habit_id = ? AND entry_date = ?",
+                (habit.id, today)
+            ).fetchone()
+            if previous is None:
+                self._append_entry_count(habit.id, today, row["value"])
+                self._log_change("entry_added", habit.id, habit.name, today, row["value"])
+            else:
+                self._append_entry_count(habit.id, today, row["value"], previous["value"])
+                self._log_change("entry_updated", habit.id, habit.name, today, row["value"])
+        
+        return self._row_to_entry(row)
+    
+    def _append_entry_count(
+        self, habit_id: int, entry_date: date, value: float = 1.0,
+        previous: Optional[float] = None,
+    ) -> None:
+        """Record a new or grown entry in the ``entry_counts`` and ``entry_values`` aggregates.
+        
+        Entries are normally written for today, which makes this a single
+        insert or update per table; later rows are only touched when a past
+        date is backfilled. Does not commit.
+        
+        Args:
+            habit_id: Habit of the entry.
+            entry_date: Date of the entry.
+            value: The entry's amount after the write.
+            previous: The entry's amount before the write, or None if the
+                entry is new.
+        """
+        conn = self._get_connection()
+        if previous is None:
+            conn.execute("""
+                INSERT INTO entry_counts (habit_id, entry_date, cumulative, cumulative_value)
+                SELECT ?, ?, 1 + COALESCE(MAX(cumulative), 0), ? + COALESCE(MAX(cumulative_value), 0)
+                FROM (
+                    SELECT cumulative, cumulative_value FROM entry_counts
+                    WHERE habit_id = ? AND entry_date < ?
+                    ORDER BY entry_date DESC
+                    LIMIT 1
+                )
+            """, (habit_id, entry_date, value, habit_id, entry_date))
+            conn.execute(
+                "UPDATE entry_counts SET cumulative = cumulative + 1, "
+                "cumulative_value = cumulative_value + ? "
+                "WHERE habit_id = ? AND entry_date > ?",
+                (value, habit_id, entry_date)
+            )
+        else:
+            conn.execute(
+                "UPDATE entry_counts SET cumulative_value = cumulative_value + ? "
+                "WHERE habit_id = ? AND entry_date >= ?",
+                (value - previous, habit_id, entry_date)
             )
+            conn.execute(
+                "UPDATE entry_values SET days = days - 1 WHERE habit_id = ? AND value = ?",
+                (habit_id, previous)
+            )
+            conn.execute(
+                "DELETE FROM entry_values WHERE habit_id = ? AND value = ? AND days = 0",
+                (habit_id, previous)
+            )
+        conn.execute("""
+            INSERT INTO entry_values (habit_id, value, days) VALUES (?, ?, 1)
+            ON CONFLICT (habit_id, value) DO UPDATE SET days = days + 1
+        """, (habit_id, value))
     
-    def list_habits(self, show_all: bool = False) -> List[Habit]:
-        """List all habits with their completion status.
+    def rebuild_entry_counts(self, habit_ids: Optional[Sequence[int]] = None) -> None:
+        """Recompute the ``entry_counts`` and ``entry_values`` aggregates from ``entries``.
+        
+        Use after writing to ``entries`` directly (bulk imports, manual
+        edits) instead of through ``mark_habit_done`` or ``log_amount``.
+        
+        Args:
+            habit_ids: Habits to rebuild. ``None`` rebuilds every habit.
+        """
+        with self._write_transaction():
+            if habit_ids is None:
+                self._rebuild_entry_counts()
+            else:
+                self._rebuild_entry_counts(
+                    f"WHERE habit_id IN ({', '.join('?' * len(habit_ids))})", tuple(habit_ids)
+                )
+    
+    def _rebuild_entry_counts(
+        self, where: str = "", params: Sequence[object] = (), schema: str = "main"
+    ) -> None:
+        """Recompute entry aggregate rows selected by a WHERE clause on habit_id.
+        
+        Does not commit.
+        
+        Args:
+            where: ``WHERE`` clause restricting ``habit_id``; empty for all rows.
+            params: Parameters for ``where``.
+            schema: Database schema to rebuild, e.g. an attached database.
+        """
+        conn = self._get_connection()
+        conn.execute(f"DELETE FROM {schema}.entry_counts {where}", params)
+        conn.execute(f"""
+            INSERT INTO {schema}.entry_counts (habit_id, entry_date, cumulative, cumulative_value)
+            SELECT habit_id, entry_date,
+                   COUNT(*) OVER (PARTITION BY habit_id ORDER BY entry_date),
+                   SUM(value) OVER (PARTITION BY habit_id ORDER BY entry_date)
+            FROM {schema}.entries
+            {where}
+        """, params)
+        conn.execute(f"DELETE FROM {schema}.entry_values {where}", params)
+        conn.execute(f"""
+            INSERT INTO {schema}.entry_values (habit_id, value, days)
+            SELECT habit_id, value, COUNT(*)
+            FROM {schema}.entries
+            {where}
+            GROUP BY habit_id, value
+        """, params)
+    
+    def calendar_rate(
+        self,
+        habit_ids: Sequence[int],
+        start: Union[date, Sequence[date]],
+        end: Union[date, Sequence[date]],
+    ) -> List[float]:
+        """Get raw calendar-day completion rates for many habit/date-range pairs.
+        
+        The rate is completed days over calendar days in the range. It ignores
+        habit schedules; ``iter_stats`` and ``get_stats`` rate against them.
+        Each count is the difference of two seeks into the ``entry_counts``
+        prefix-sum index, so the cost does not grow with the range length.
         
         Args:
-            show_all: If True, show all habits. If False, only show today's status.
+            habit_ids: Habit IDs to query.
+            start: First date of each range, or one date shared by all.
+            end: Last date of each range (inclusive), or one date shared by all.
             
         Returns:
-            List of Habit objects with completion status.
+            Completion percentages aligned with ``habit_ids``.
+            
+        Raises:
+            ValueError: If the inputs have mismatched lengths or a range ends
+                before it starts.
         """
         conn = self._get_connection()
+        starts, ends = self._fill_range_queries(habit_ids, start, end)
+        rows = conn.execute("""
+            SELECT COALESCE((
+                       SELECT c.cumulative FROM entry_counts c
+                       WHERE c.habit_id = r.habit_id AND c.entry_date <= r.end_date
+                       ORDER BY c.entry_date DESC
+                       LIMIT 1
+                   ), 0)
+                 - COALESCE((
+                       SELECT c.cumulative FROM entry_counts c
+                       WHERE c.habit_id = r.habit_id AND c.entry_date < r.start_date
+                       ORDER BY c.entry_date DESC
+                       LIMIT 1
+                   ), 0) as completed_days
+            FROM temp.range_queries r
+            ORDER BY r.idx
+        """).fetchall()
+        conn.execute("DELETE FROM temp.range_queries")
+        conn.commit()
         
-        if show_all:
-            # Show all habits with completion status for today
-            query = """
-                SELECT h.*, 
-                       CASE WHEN e.id IS NOT NULL THEN 1 ELSE 0 END as completed_today
-                FROM habits h
-                LEFT JOIN entries e ON h.id = e.habit_id AND e.entry_date = ?
-                ORDER BY h.name
-            """
-            rows = conn.execute(query, (date.today(),)).fetchall()
-        else:
-            # Show only habits that have been created
-            rows = conn.execute(
-                "SELECT * FROM habits ORDER BY name"
-            ).fetchall()
+        return [
+            (row["completed_days"] / ((e - s).days + 1)) * 100
+            for row, s, e in zip(rows, starts, ends)
+        ]
+    
+    def value_stats(
+        self,
+        habit_ids: Sequence[int],
+        start: Union[date, Sequence[date]],
+        end: Union[date, Sequence[date]],
+    ) -> List[ValueStats]:
+        """Get logged-amount totals for many habit/date-range pairs in one query.
+        
+        Totals and logged days are differences of two seeks into the
+        ``entry_counts`` prefix sums, like ``calendar_rate``.
+        
+        Args:
+            habit_ids: Habit IDs to query.
+            start: First date of each range, or one date shared by all.
+            end: Last date of each range (inclusive), or one date shared by all.
+            
+        Returns:
+            ValueStats aligned with ``habit_ids``.
+            
+        Raises:
+            ValueError: If the inputs have mismatched lengths or a range ends
+                before it starts.
+        """
+        conn = self._get_connection()
+        self._fill_range_queries(habit_ids, start, end)
+        rows = conn.execute("""
+            SELECT upper.cumulative - COALESCE(lower.cumulative, 0) AS days,
+                   upper.cumulative_value - COALESCE(lower.cumulative_value, 0) AS total
+            FROM temp.range_queries r
+            LEFT JOIN entry_counts upper ON upper.habit_id = r.habit_id
+                AND upper.entry_date = (
+                    SELECT MAX(c.entry_date) FROM entry_counts c
+                    WHERE c.habit_id = r.habit_id AND c.entry_date <= r.end_date
+                )
+            LEFT JOIN entry_counts lower ON lower.habit_id = r.habit_id
+                AND lower.entry_date = (
+                    SELECT MAX(c.entry_date) FROM entry_counts c
+                    WHERE c.habit_id = r.habit_id AND c.entry_date < r.start_date
+                )
+            ORDER BY r.idx
+        """).fetchall()
+        conn.execute("DELETE FROM temp.range_queries")
+        conn.commit()
         
-        habits = []
+        results = []
         for row in rows:
-            habit = Habit(
-                id=row["id"],
-                name=row["name"],
-                created_at=datetime.fromisoformat(row["created_at"])
+            days, total = row["days"] or 0, row["total"] or 0.0
+            results.append(ValueStats(
+                total=total,
+                days=days,
+                average=total / days if days else None,
+            ))
+        return results
+    
+    def value_percentiles(
+        self, habit_ids: Sequence[int], percentiles: Sequence[int] = (50, 90)
+    ) -> List[Dict[int, float]]:
+        """Get percentiles of each habit's daily amounts over all logged days.
+        
+        Walks the ``entry_values`` histogram, whose size is the number of
+        distinct daily amounts rather than days. The histogram has no dates,
+        so there is no range: every logged day counts.
+        
+        Args:
+            habit_ids: Habit IDs to query.
+            percentiles: Percentiles to compute, each from 1 to 100.
+            
+        Returns:
+            One dict per habit, aligned with ``habit_ids``, mapping each
+            percentile to its nearest-rank daily amount. Empty if nothing
+            was logged.
+            
+        Raises:
+            ValueError: If a percentile is out of range.
+        """
+        if any(not 1 <= p <= 100 for p in percentiles):
+            raise ValueError("Percentiles must be between 1 and 100")
+        if not percentiles:
+            return [{} for _ in habit_ids]
+        
+        conn = self._get_connection()
+        by_habit: Dict[int, Dict[int, float]] = {}
+        for offset in range(0, len(habit_ids), 500):
+            chunk = habit_ids[offset:offset + 500]
+            # Nearest rank: the smallest amount whose running count of days
+            # reaches p% of all logged days
+            for row in conn.execute(f"""
+                SELECT habit_id, {", ".join(
+                    f"MIN(CASE WHEN running * 100 >= {p} * days THEN value END)"
+                    for p in percentiles
+                )}
+                FROM (
+                    SELECT habit_id, value,
+                           SUM(days) OVER (PARTITION BY habit_id ORDER BY value) AS running,
+                           SUM(days) OVER (PARTITION BY habit_id) AS days
+                    FROM entry_values
+                    WHERE habit_id IN ({", ".join("?" * len(chunk))})
+                )
+                GROUP BY habit_id
+            """, chunk):
+                by_habit[row[0]] = dict(zip(percentiles, tuple(row)[1:]))
+        return [by_habit.get(habit_id, {}) for habit_id in habit_ids]
+    
+    def _fill_range_queries(
+        self,
+        habit_ids: Sequence[int],
+        start: Union[date, Sequence[date]],
+        end: Union[date, Sequence[date]],
+    ) -> Tuple[List[date], List[date]]:
+        """Load habit/date-range pairs into ``temp.range_queries``. Does not commit.
+        
+        Returns:
+            The start and end date of every range.
+            
+        Raises:
+            ValueError: If the inputs have mismatched lengths or a range ends
+                before it starts.
+        """
+        starts = [start] * len(habit_ids) if isinstance(start, date) else list(start)
+        ends = [end] * len(habit_ids) if isinstance(end, date) else list(end)
+        if not len(habit_ids) == len(starts) == len(ends):
+            raise ValueError("habit_ids, start and end must have the same length")
+        if any(e < s for s, e in zip(starts, ends)):
+            raise ValueError("Range end must not be before its start")
+        
+        conn = self._get_connection()
+        conn.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS range_queries (
+                idx INTEGER PRIMARY KEY,
+                habit_id INTEGER NOT NULL,
+                start_date DATE NOT NULL,
+                end_date DATE NOT NULL
             )
+        """)
+        conn.executemany(
+            "INSERT INTO temp.range_queries VALUES (?, ?, ?, ?)",
+            zip(range(len(habit_ids)), habit_ids, starts, ends)
+        )
+        return starts, ends
+    
+    def remove_habits(
+        self,
+        names: Sequence[str] = (),
+        pattern: Optional[str] = None,
+        vacuum: bool = False,
+    ) -> List[str]:
+        """Remove habits together with their full history.
+        
+        Entries are deleted newest first in chunks of ``DELETE_CHUNK_SIZE``
+        rows, together with their prefix-sum and histogram rows, each chunk
+        in its own short transaction. The write lock is released regularly
+        even for habits with long histories, and a removal that stops
+        partway leaves the remaining entries and aggregates consistent.
+        
+        Args:
+            names: Exact habit names to remove.
+            pattern: Shell-style glob (``GLOB`` syntax) selecting more habits.
+            vacuum: If True, run an incremental vacuum afterwards to return
+                freed pages to the file system.
             
-            if show_all:
-                habit.completed_today = bool(row["completed_today"])
-            else:
-                # Check if completed today
-                entry = conn.execute(
-                    "SELECT id FROM entries WHERE habit_id = ? AND entry_date = ?",
-                    (habit.id, date.today())
-                ).fetchone()
-                habit.completed_today = entry is not None
+        Returns:
+            Names of the removed habits, in name order.
             
-            habits.append(habit)
+        Raises:
+            ValueError: If any of ``names`` doesn't exist. Nothing is removed.
+        """
+        conn = self._get_connection()
+        habits = {}
+        for name in names:
+            habit = self.get_habit_by_name(name)
+            if habit is None:
+                raise ValueError(f"Habit '{name}' not found")
+            habits[habit.id] = habit.name
+        if pattern is not None:
+            for row in conn.execute(
+                "SELECT id, name FROM habits WHERE name GLOB ?", (pattern,)
+            ):
+                habits[row["id"]] = row["name"]
         
-        return habits
+        # Each chunk takes a habit's newest entries, so the prefix sums left
+        # behind for earlier dates stay correct. Entries and their derived
+        # rows go in the same transaction, so every commit is consistent.
+        chunk_deletes = (
+            """
+                UPDATE entry_values SET days = days - (
+                    SELECT COUNT(*) FROM entries e
+                    WHERE e.habit_id = entry_values.habit_id
+                        AND e.entry_date >= :cutoff AND e.value = entry_values.value
+                )
+                WHERE habit_id = :habit_id AND value IN (
+                    SELECT value FROM entries
+                    WHERE habit_id = :habit_id AND entry_date >= :cutoff
+                )
+            """,
+            "DELETE FROM entry_values WHERE habit_id = :habit_id AND days <= 0",
+            "DELETE FROM entry_counts WHERE habit_id = :habit_id AND entry_date >= :cutoff",
+            "DELETE FROM entries WHERE habit_id = :habit_id AND entry_date >= :cutoff",
+        )
+        
+        for habit_id in habits:
+            params = {"habit_id": habit_id, "limit": DELETE_CHUNK_SIZE}
+            while True:
+                with self._write_transaction():
+                    (params["cutoff"],) = conn.execute("""
+                        SELECT MIN(entry_date) FROM (
+                            SELECT entry_date FROM entries WHERE habit_id = :habit_id
+                            ORDER BY entry_date DESC
+                            LIMIT :limit
+                        )
+                    """, params).fetchone()
+                    if params["cutoff"] is None:
+                        break
+                    for statement in chunk_deletes:
+                        conn.execute(statement, params)
+            with self._write_transaction():
+                # Derived rows left over from direct writes to entries
+                conn.execute("DELETE FROM entry_counts WHERE habit_id = ?", (habit_id,))
+                conn.execute("DELETE FROM entry_values WHERE habit_id = ?", (habit_id,))
+                conn.execute("DELETE FROM habits WHERE id = ?", (habit_id,))
+                self._log_change("habit_removed", habit_id, habits[habit_id])
+        
+        if vacuum:
+            # The pragma frees one page per step and returns no rows, so
+            # execute() would stop after the first page; run it to completion
+            conn.executescript("PRAGMA incremental_vacuum")
+        
+        return sorted(habits.values())
+    
+    def _log_change(
+        self, op: str, habit_id: int, habit_name: str, entry_date: Optional[date] = None,
+        value: Optional[float] = None,
+    ) -> None:
+        """Append a row to the ``changes`` log. Does not commit."""
+        self._get_connection().execute(
+            "INSERT INTO changes (op, habit_id, habit_name, entry_date, value)"
+            " VALUES (?, ?, ?, ?, ?)",
+            (op, habit_id, habit_name, entry_date, value)
+        )
+    
+    def data_version(self) -> int:
+        """Get a counter that changes whenever another connection commits.
+        
+        Returns:
+            The current ``PRAGMA data_version`` value for this connection.
+        """
+        (version,) = self._get_connection().execute("PRAGMA data_version").fetchone()
+        return version
     
-    def get_stats(self, days: int) -> List[Tuple[str, float]]:
-        """Get completion statistics for habits over a time period.
+    def changes_since(self, cursor: int = 0, limit: int = PAGE_SIZE) -> List[Change]:
+        """Get change-log rows recorded after a cursor.
+        
+        Reads are a range scan on the ``changes`` primary key, so the cost is
+        proportional to the number of new changes, not the table size.
         
         Args:
-            days: Number of days to look back for statistics.
+            cursor: Sequence number of the last change already processed.
+                Pass 0 to start from the beginning.
+            limit: Maximum number of changes to return.
             
         Returns:
-            List of tuples containing (habit_name, completion_percentage).
+            Change objects in sequence order. Pass the ``seq`` of the last one
+            as the next cursor.
         """
         conn = self._get_connection()
+        rows = conn.execute(
+            "SELECT * FROM changes WHERE seq > ? ORDER BY seq LIMIT ?",
+            (cursor, limit)
+        ).fetchall()
+        return [
+            Change(
+                seq=row["seq"],
+                op=row["op"],
+                habit_id=row["habit_id"],
+                habit_name=row["habit_name"],
+                entry_date=date.fromisoformat(row["entry_date"]) if row["entry_date"] else None,
+                created_at=datetime.fromisoformat(row["created_at"]),
+                value=row["value"],
+            )
+            for row in rows
+        ]
+    
+    def database_id(self) -> str:
+        """Get the random ID that identifies this database file."""
+        (database_id,) = self._get_connection().execute(
+            "SELECT value FROM meta WHERE key = 'database_id'"
+        ).fetchone()
+        return database_id
+    
+    def last_change_seq(self) -> int:
+        """Get the sequence number of the latest change, or 0 if none."""
+        (seq,) = self._get_connection().execute(
+            "SELECT COALESCE(MAX(seq), 0) FROM changes"
+        ).fetchone()
+        return seq
+    
+    def summarize_changes_since(self, cursor: int) -> Tuple[bool, Optional[date]]:
+        """Summarize the change log after a cursor without reading every row.
         
-        # Calculate the start date
-        end_date = date.today()
-        start_date = end_date - timedelta(days=days - 1)
+        Args:
+            cursor: Sequence number of the last change already processed.
+            
+        Returns:
+            Whether any habit was added or removed, and the earliest date of
+            an added entry (None if no entries were added). Amounts added to
+            existing entries don't change completions, so they are ignored.
+        """
+        habits_changed, earliest = self._get_connection().execute("""
+            SELECT COALESCE(MAX(op NOT IN ('entry_added', 'entry_updated')), 0),
+                   MIN(CASE WHEN op = 'entry_added' THEN entry_date END)
+            FROM changes
+            WHERE seq > ?
+        """, (cursor,)).fetchone()
+        return bool(habits_changed), date.fromisoformat(earliest) if earliest else None
+    
+    def first_entry_date(self) -> Optional[date]:
+        """Get the date of the earliest entry, or None if there are none."""
+        (earliest,) = self._get_connection().execute(
+            "SELECT MIN(entry_date) FROM entries"
+        ).fetchone()
+        return date.fromisoformat(earliest) if earliest else None
+    
+    def habit_signature(self) -> Tuple[int, int, int]:
+        """Get the highest habit ID, the number of habits and the schedule version.
+        
+        The signature changes whenever a habit is added or removed or its
+        schedule changes, so a cached habit list only needs re-reading when
+        it does.
+        
+        Returns:
+            The highest habit ID (0 if none), the habit count and the number
+            of schedule changes made so far.
+        """
+        return tuple(self._get_connection().execute("""
+            SELECT COALESCE(MAX(id), 0), COUNT(*),
+                   (SELECT COALESCE(MAX(CAST(value AS INTEGER)), 0) FROM meta
+                    WHERE key = 'schedule_version')
+            FROM habits
+        """).fetchone())
+    
+    def last_entry_id(self) -> int:
+        """Get the highest entry ID, or 0 if there are no entries."""
+        (entry_id,) = self._get_connection().execute(
+            "SELECT COALESCE(MAX(id), 0) FROM entries"
+        ).fetchone()
+        return entry_id
+    
+    def entries_since(self, entry_id: int) -> List[Entry]:
+        """Get entries added after an entry ID.
+        
+        Reads are a range scan on the ``entries`` primary key, so the cost is
+        proportional to the number of new entries.
+        
+        Args:
+            entry_id: ID of the last entry already seen, e.g. from
+                ``last_entry_id``.
+            
+        Returns:
+            Entry objects in ID order.
+        """
+        rows = self._get_connection().execute(
+            "SELECT * FROM entries WHERE id > ? ORDER BY id", (entry_id,)
+        ).fetchall()
+        return [self._row_to_entry(row) for row in rows]
+    
+    def completion_offsets(
+        self, start: date, end: date, habit_ids: Optional[Sequence[int]] = None
+    ) -> List[Tuple[int, int]]:
+        """Get every completion in a date range as a habit ID and day offset.
         
+        Args:
+            start: First date of the range; its offset is 0.
+            end: Last date of the range, inclusive.
+            habit_ids: Only include these habits. ``None`` means all habits.
+            
+        Returns:
+            ``(habit_id, days after start)`` pairs, in no particular order.
+        """
+        conn = self._get_connection()
         query = """
-            SELECT h.name,
-                   COUNT(e.id) as completed_days,
-                   ? as total_days
-            FROM habits h
-            LEFT JOIN entries e ON h.id = e.habit_id 
-                AND e.entry_date BETWEEN ? AND ?
-            GROUP BY h.id, h.name
-            ORDER BY h.name
+            SELECT habit_id, CAST(julianday(entry_date) - julianday(?) AS INTEGER)
+            FROM entries
+            WHERE entry_date BETWEEN ? AND ? {where}
         """
+        if habit_ids is None:
+            return [tuple(row) for row in conn.execute(query.format(where=""), (start, start, end))]
         
-        rows = conn.execute(query, (days, start_date, end_date)).fetchall()
+        offsets: List[Tuple[int, int]] = []
+        for offset in range(0, len(habit_ids), 500):
+            chunk = habit_ids[offset:offset + 500]
+            where = f"AND habit_id IN ({', '.join('?' * len(chunk))})"
+            offsets.extend(
+                tuple(row) for row in conn.execute(query.format(where=where), (start, start, end, *chunk))
+            )
+        return offsets
+    
+    def sync_with(self, peer_path: Path) -> SyncResult:
+        """Merge habits and entries both ways with another database file.
         
-        stats = []
-        for row in rows:
-            completion_rate = (row["completed_days"] / row["total_days"]) * 100
-            stats.append((row["name"], completion_rate))
+        The peer is attached to this connection and rows are copied with
+        set-based statements. Habits are matched by name, so differing IDs
+        on the two sides are reconciled. Each side remembers the highest
+        habit ID, entry ID and change seq it has pulled from the other, so
+        later syncs only read rows added or updated since.
         
-        return stats
+        When both sides hold an entry for the same habit and day, the larger
+        amount wins on both; amounts logged separately on each side are not
+        added together.
+        
+        Habit removals are not propagated. When the other side records new
+        entries for a habit removed on this side, the habit is re-created
+        with just those new entries; its older history stays removed.
+        
+        Args:
+            peer_path: Path to the other habit database.
+            
+        Returns:
+            SyncResult counting the rows copied in each direction.
+            
+        Raises:
+            ValueError: If the peer file doesn't exist or is this database.
+        """
+        if not Path(peer_path).exists():
+            raise ValueError(f"Database '{peer_path}' not found")
+        if Path(peer_path).resolve() == Path(self.db_path).resolve():
+            raise ValueError("Cannot sync a database with itself")
+        
+        # Make sure both files have the current schema
+        with HabitDatabase(Path(peer_path)) as peer:
+            peer.init_database()
+        self.init_database()
+        
+        conn = self._get_connection()
+        conn.execute("ATTACH DATABASE ? AS peer", (str(peer_path),))
+        try:
+            # BEGIN IMMEDIATE takes the write lock on both files
+            with self._write_transaction():
+                own_id = conn.execute(
+                    "SELECT value FROM main.meta WHERE key = 'database_id'"
+                ).fetchone()[0]
+                peer_id = conn.execute(
+                    "SELECT value FROM peer.meta WHERE key = 'database_id'"
+                ).fetchone()[0]
+                if peer_id == own_id:
+                    # A copied file shares its ID with the original: give the
+                    # peer a fresh identity and let this first sync be a full one
+                    peer_id = uuid.uuid4().hex
+                    conn.execute(
+                        "UPDATE peer.meta SET value = ? WHERE key = 'database_id'", (peer_id,)
+                    )
+                
+                habits_pulled, entries_pulled = self._pull("peer", "main", peer_id)
+                habits_pushed, entries_pushed = self._pull("main", "peer", own_id)
+                # Both files are locked, so every peer row past the watermark was
+                # just copied from here; skip them instead of re-reading the echo
+                conn.execute("""
+                    UPDATE main.sync_state
+                    SET habit_watermark = (SELECT COALESCE(MAX(id), 0) FROM peer.habits),
+                        entry_watermark = (SELECT COALESCE(MAX(id), 0) FROM peer.entries),
+                        change_watermark = (SELECT COALESCE(MAX(seq), 0) FROM peer.changes)
+                    WHERE peer_id = ?
+                """, (peer_id,))
+        finally:
+            conn.execute("DETACH DATABASE peer")
+        
+        return SyncResult(
+            habits_pulled=habits_pulled,
+            entries_pulled=entries_pulled,
+            habits_pushed=habits_pushed,
+            entries_pushed=entries_pushed,
+        )
+    
+    def _pull(self, src: str, dst: str, src_id: str) -> Tuple[int, int]:
+        """Copy habits and entries added or updated in ``src`` since the last sync into ``dst``.
+        
+        Entries whose amount grew are found through ``entry_updated`` rows
+        of the ``src`` change log. An entry for a day ``dst`` already has
+        keeps the larger of the two amounts. Also brings the derived tables
+        of ``dst`` up to date. Does not commit.
+        
+        Args:
+            src: Schema name to read from (``main`` or ``peer``).
+            dst: Schema name to write to.
+            src_id: Database ID of ``src``, keying the watermark in ``dst``.
+            
+        Returns:
+            Number of habits added to ``dst``, and of entries added or updated.
+        """
+        conn = self._get_connection()
+        conn.execute(
+            f"INSERT OR IGNORE INTO {dst}.sync_state (peer_id) VALUES (?)", (src_id,)
+        )
+        habit_mark, entry_mark, change_mark = conn.execute(f"""
+            SELECT habit_watermark, entry_watermark, change_watermark
+            FROM {dst}.sync_state WHERE peer_id = ?
+        """, (src_id,)).fetchone()
+        src_habits, src_entries, src_changes = conn.execute(f"""
+            SELECT (SELECT COALESCE(MAX(id), 0) FROM {src}.habits),
+                   (SELECT COALESCE(MAX(id), 0) FROM {src}.entries),
+                   (SELECT COALESCE(MAX(seq), 0) FROM {src}.changes)
+        """).fetchone()
+        dst_habits, dst_entries, dst_changes = conn.execute(f"""
+            SELECT (SELECT COALESCE(MAX(id), 0) FROM {dst}.habits),
+                   (SELECT COALESCE(MAX(id), 0) FROM {dst}.entries),
+                   (SELECT COALESCE(MAX(seq), 0) FROM {dst}.changes)
+        """).fetchone()
+        
+        # Collect the entries to copy: those added since the last sync, and
+        # those whose amount grew since, at their current amount
+        conn.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS sync_entries (
+                src_id INTEGER PRIMARY KEY,
+                habit_name TEXT NOT NULL,
+                entry_date DATE NOT NULL,
+                created_at TIMESTAMP,
+                value REAL NOT NULL
+            )
+        """)
+        conn.execute(f"""
+            INSERT OR IGNORE INTO temp.sync_entries
+            SELECT se.id, sh.name, se.entry_date, se.created_at, se.value
+            FROM {src}.entries se
+            JOIN {src}.habits sh ON sh.id = se.habit_id
+            WHERE se.id > ? AND se.id <= ?
+            UNION ALL
+            SELECT se.id, sh.name, se.entry_date, se.created_at, se.value
+            FROM {src}.changes c
+            JOIN {src}.entries se ON se.habit_id = c.habit_id AND se.entry_date = c.entry_date
+            JOIN {src}.habits sh ON sh.id = se.habit_id
+            WHERE c.op = 'entry_updated' AND c.seq > ? AND c.seq <= ?
+        """, (entry_mark, src_entries, change_mark, src_changes))
+        
+        # Habits are matched by name; the UNIQUE index skips known ones.
+        # Habits with entries to copy are included so that one removed from
+        # dst is re-created rather than silently dropping those entries.
+        conn.execute(f"""
+            INSERT OR IGNORE INTO {dst}.habits (name, created_at, weekdays, weekly_target)
+            SELECT name, created_at, weekdays, weekly_target FROM {src}.habits
+            WHERE id > ? AND id <= ?
+                OR name IN (SELECT habit_name FROM temp.sync_entries)
+            ORDER BY id
+        """, (habit_mark, src_habits))
+        # Log the entries that are about to grow while their old amount is
+        # still there to compare with
+        updated = conn.execute(f"""
+            INSERT INTO {dst}.changes (op, habit_id, habit_name, entry_date, value)
+            SELECT 'entry_updated', de.habit_id, dh.name, de.entry_date, i.value
+            FROM temp.sync_entries i
+            JOIN {dst}.habits dh ON dh.name = i.habit_name
+            JOIN {dst}.entries de ON de.habit_id = dh.id AND de.entry_date = i.entry_date
+            WHERE i.value > de.value
+            ORDER BY i.src_id
+        """).rowcount
+        # Entries are re-keyed to the destination habit ID via the name.
+        # "WHERE true" stops SQLite reading ON CONFLICT as a join constraint.
+        conn.execute(f"""
+            INSERT INTO {dst}.entries (habit_id, entry_date, created_at, value)
+            SELECT dh.id, i.entry_date, i.created_at, i.value
+            FROM temp.sync_entries i
+            JOIN {dst}.habits dh ON dh.name = i.habit_name
+            WHERE true
+            ORDER BY i.src_id
+            ON CONFLICT (habit_id, entry_date) DO UPDATE SET value = excluded.value
+            WHERE excluded.value > value
+        """)
+        conn.execute("DELETE FROM temp.sync_entries")
+        
+        # AUTOINCREMENT keys make every row added above sort after dst_*
+        new_habits = conn.execute(
+            f"SELECT id, name FROM {dst}.habits WHERE id > ?", (dst_habits,)
+        ).fetchall()
+        for row in new_habits:
+            self._index_name(row["id"], row["name"], schema=dst)
+        self._rebuild_entry_counts(
+            f"""WHERE habit_id IN (SELECT habit_id FROM {dst}.entries WHERE id > ?)
+                OR habit_id IN (
+                    SELECT habit_id FROM {dst}.changes
+                    WHERE seq > ? AND op = 'entry_updated'
+                )""",
+            (dst_entries, dst_changes),
+            schema=dst,
+        )
+        conn.execute(f"""
+            INSERT INTO {dst}.changes (op, habit_id, habit_name, entry_date)
+            SELECT 'habit_added', id, name, NULL FROM {dst}.habits WHERE id > ?
+        """, (dst_habits,))
+        (new_entries,) = conn.execute(f"""
+            SELECT COUNT(*) FROM {dst}.entries WHERE id > ?
+        """, (dst_entries,)).fetchone()
+        conn.execute(f"""
+            INSERT INTO {dst}.changes (op, habit_id, habit_name, entry_date, value)
+            SELECT 'entry_added', e.habit_id, h.name, e.entry_date, e.value
+            FROM {dst}.entries e JOIN {dst}.habits h ON h.id = e.habit_id
+            WHERE e.id > ?
+            ORDER BY e.id
+        """, (dst_entries,))
+        
+        conn.execute(f"""
+            UPDATE {dst}.sync_state
+            SET habit_watermark = ?, entry_watermark = ?, change_watermark = ?
+            WHERE peer_id = ?
+        """, (src_habits, src_entries, src_changes, src_id))
+        return len(new_habits), new_entries + updated
+    
+    def _row_to_habit(self, row: sqlite3.Row) -> Habit:
+        """Build a Habit from a ``habits`` row.
+        
+        Raises:
+            ValueError: If the habits table predates schedules.
+        """
+        if "weekdays" not in row.keys():
+            raise ValueError("The database is out of date; run 'habit init' to upgrade it")
+        habit = Habit(
+            id=row["id"],
+            name=row["name"],
+            created_at=datetime.fromisoformat(row["created_at"]),
+            weekdays=row["weekdays"],
+            weekly_target=row["weekly_target"],
+        )
+        if "completed_today" in row.keys():
+            habit.completed_today = bool(row["completed_today"])
+        return habit
+    
+    def _row_to_entry(self, row: sqlite3.Row) -> Entry:
+        """Build an Entry from an ``entries`` row."""
+        return Entry(
+            id=row["id"],
+            habit_id=row["habit_id"],
+            entry_date=date.fromisoformat(row["entry_date"]),
+            created_at=datetime.fromisoformat(row["created_at"]),
+            value=row["value"],
+        )
+    
+    def iter_habits(
+        self, after: Optional[str] = None, limit: Optional[int] = None
+    ) -> Iterator[Habit]:
+        """Iterate over habits ordered by name, with today's completion status.
+        
+        Rows are fetched in pages of ``PAGE_SIZE`` using keyset pagination on
+        the unique ``habits.name`` index, so memory use stays flat no matter
+        how many habits exist.
+        
+        Args:
+            after: Only yield habits whose name sorts after this value.
+            limit: Maximum number of habits to yield. ``None`` means no limit.
+            
+        Yields:
+            Habit objects with ``completed_today`` populated.
+        """
+        conn = self._get_connection()
+        today = date.today()
+        remaining = limit
+        
+        while remaining is None or remaining > 0:
+            page_size = PAGE_SIZE if remaining is None else min(PAGE_SIZE, remaining)
+            where = "WHERE h.name > ?" if after is not None else ""
+            params: tuple = (today, after, page_size) if after is not None else (today, page_size)
+            rows = conn.execute(f"""
+                SELECT h.*,
+                       EXISTS(
+                           SELECT 1 FROM entries e
+                           WHERE e.habit_id = h.id AND e.entry_date = ?
+                       ) as completed_today
+                FROM habits h
+                {where}
+                ORDER BY h.name
+                LIMIT ?
+            """, params).fetchall()
+            
+            for row in rows:
+                yield self._row_to_habit(row)
+            
+            if len(rows) < page_size:
+                return
+            after = rows[-1]["name"]
+            if remaining is not None:
+                remaining -= len(rows)
+    
+    def iter_entries(
+        self,
+        name: str,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+    ) -> Iterator[Entry]:
+        """Iterate over a habit's entries in date order.
+        
+        Pages are read with keyset pagination on the
+        ``UNIQUE(habit_id, entry_date)`` index.
+        
+        Args:
+            name: Name of the habit whose entries to read.
+            start: First date to include. ``None`` means from the beginning.
+            end: Last date to include. ``None`` means up to today.
+            
+        Yields:
+            Entry objects ordered by ``entry_date``.
+            
+        Raises:
+            ValueError: If habit doesn't exist.
+        """
+        habit = self.get_habit_by_name(name)
+        if habit is None:
+            raise ValueError(f"Habit '{name}' not found")
+        
+        conn = self._get_connection()
+        end = end or date.today()
+        # Keyset cursor: the last date already yielded (exclusive lower bound).
+        last: Optional[date] = None
+        
+        while True:
+            if last is None:
+                lower, op = (start or date.min), ">="
+            else:
+                lower, op = last, ">"
+            rows = conn.execute(f"""
+                SELECT * FROM entries
+                WHERE habit_id = ? AND entry_date {op} ? AND entry_date <= ?
+                ORDER BY entry_date
+                LIMIT ?
+            """, (habit.id, lower, end, PAGE_SIZE)).fetchall()
+            
+            for row in rows:
+                yield self._row_to_entry(row)
+            
+            if len(rows) < PAGE_SIZE:
+                return
+            last = date.fromisoformat(rows[-1]["entry_date"])
+    
+    def list_habits(self, show_all: bool = False) -> List[Habit]:
+        """List all habits with their completion status.
+        
+        Args:
+            show_all: Deprecated and ignored. Every habit is always listed
+                with today's status.
+            
+        Returns:
+            List of Habit objects with completion status.
+        """
+        if show_all:
+            warnings.warn(
+                "list_habits(show_all=...) is deprecated and has no effect",
+                DeprecationWarning,
+                stacklevel=2,
+            )
+        return list(self.iter_habits())
+    
+    def iter_stats(
+        self,
+        days: Union[int, Sequence[int]],
+        after: Optional[str] = None,
+        limit: Optional[int] = None,
+        names: Optional[Sequence[str]] = None,
+    ) -> Iterator[StatsRow]:
+        """Iterate over schedule-aware completion statistics, one habit at a time.
+        
+        Habits are paged by name with keyset pagination, and each page takes
+        one query. A recursive calendar CTE lists every day of the largest
+        window with its weekday, age and month, so due days per weekday are
+        counted once per page rather than per habit. Entries are scanned
+        once, joined to their calendar day, and grouped into 7-day buckets
+        ending today, which lets a weekly target cap what each week
+        contributes. Every window, weekday and month column is filled by
+        conditional aggregation in that same scan.
+        
+        A habit due on set weekdays is expected once on each of them, and
+        only completions on those days count. A habit with a weekly target
+        is expected ``weekly_target`` times per 7 days, prorated for windows
+        that are not whole weeks.
+        
+        Args:
+            days: Window length in days, or several window lengths.
+            after: Only yield habits whose name sorts after this value.
+            limit: Maximum number of habits to yield. ``None`` means no limit.
+            names: Only include habits with these exact names.
+            
+        Yields:
+            StatsRow objects with one rate, actual and expected count per
+            window. A window with nothing due has a rate of 100%.
+        """
+        windows = [days] if isinstance(days, int) else list(days)
+        check_windows(windows)
+        conn = self._get_connection()
+        
+        # The calendar covers the largest window
+        end_date = date.today()
+        start_date = end_date - timedelta(days=max(windows) - 1)
+        months = month_keys(start_date, end_date)
+        
+        # Calendar columns: age is days before today and month indexes
+        # months; due{w}_{i} counts the days with weekday w in window i
+        due_columns = [
+            f"COUNT(CASE WHEN weekday = {weekday} AND age < {window} THEN 1 END) AS due{weekday}_{i}"
+            for weekday in range(7) for i, window in enumerate(windows)
+        ]
+        bucket_columns = [
+            *(f"COUNT(CASE WHEN c.age < {window} AND (h.weekdays >> c.weekday) & 1 "
+              f"THEN 1 END) AS done{i}" for i, window in enumerate(windows)),
+            *(f"COUNT(CASE WHEN c.weekday = {weekday} THEN 1 END) AS weekday{weekday}"
+              for weekday in range(7)),
+            *(f"COUNT(CASE WHEN c.month = {i} THEN 1 END) AS month{i}"
+              for i in range(len(months))),
+        ]
+        columns = [
+            *(f"COALESCE(SUM(MIN(b.done{i}, COALESCE(h.weekly_target, 7))), 0)"
+              for i in range(len(windows))),
+            *(f"""CASE WHEN h.weekly_target IS NULL
+                    THEN {" + ".join(f"((h.weekdays >> {weekday}) & 1) * due{weekday}_{i}"
+                                     for weekday in range(7))}
+                    ELSE h.weekly_target * {window} / 7.0
+                  END""" for i, window in enumerate(windows)),
+            *(f"COALESCE(SUM(b.weekday{weekday}), 0)" for weekday in range(7)),
+            *(f"COALESCE(SUM(b.month{i}), 0)" for i in range(len(months))),
+        ]
+        remaining = limit
+        
+        while remaining is None or remaining > 0:
+            page_size = PAGE_SIZE if remaining is None else min(PAGE_SIZE, remaining)
+            conditions: List[str] = []
+            page_params: List[object] = []
+            if after is not None:
+                conditions.append("name > ?")
+                page_params.append(after)
+            if names is not None:
+                conditions.append(f"name IN ({', '.join('?' * len(names))})")
+                page_params.extend(names)
+            where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+            page_params.append(page_size)
+            rows = conn.execute(f"""
+                WITH RECURSIVE calendar(day, weekday, age, month) AS (
+                    SELECT CAST(date(?) AS TEXT), ?, ?, 0
+                    UNION ALL
+                    SELECT date(day, '+1 day'), (weekday + 1) % 7, age - 1,
+                           month + (strftime('%d', day, '+1 day') = '01')
+                    FROM calendar
+                    WHERE age > 0
+                ),
+                due AS (
+                    SELECT {", ".join(due_columns)} FROM calendar
+                ),
+                page AS (
+                    SELECT id, name, weekdays, weekly_target FROM habits
+                    {where}
+                    ORDER BY name
+                    LIMIT ?
+                ),
+                buckets AS (
+                    -- CROSS JOIN fixes the join order: each habit's entries
+                    -- come from the (habit_id, entry_date) index, and each
+                    -- entry looks up its calendar row. Both sides of that
+                    -- lookup are TEXT so it can use an automatic index.
+                    SELECT h.id AS habit_id, {", ".join(bucket_columns)}
+                    FROM page h
+                    CROSS JOIN entries e ON h.id = e.habit_id
+                        AND e.entry_date BETWEEN ? AND ?
+                    CROSS JOIN calendar c ON c.day = CAST(e.entry_date AS TEXT)
+                    GROUP BY h.id, c.age / 7
+                )
+                SELECT h.name, {", ".join(columns)}
+                FROM page h
+                CROSS JOIN due
+                LEFT JOIN buckets b ON b.habit_id = h.id
+                GROUP BY h.id
+                ORDER BY h.name
+            """, (
+                start_date, start_date.weekday(), (end_date - start_date).days,
+                *page_params, start_date, end_date,
+            )).fetchall()
+            
+            for row in rows:
+                counts = tuple(row)[1:]
+                actual = list(counts[:len(windows)])
+                expected = [float(due) for due in counts[len(windows):2 * len(windows)]]
+                breakdown = counts[2 * len(windows):]
+                yield StatsRow(
+                    name=row["name"],
+                    rates=[
+                        min(done / due * 100, 100.0) if due else 100.0
+                        for done, due in zip(actual, expected)
+                    ],
+                    weekdays=list(breakdown[:7]),
+                    months=list(breakdown[7:]),
+                    actual=actual,
+                    expected=expected,
+                )
+            
+            if len(rows) < page_size:
+                return
+            after = rows[-1]["name"]
+            if remaining is not None:
+                remaining -= len(rows)
+    
+    def get_stats(self, days: Union[int, Sequence[int]]) -> StatsTable:
+        """Get completion statistics for habits over one or more time periods.
+        
+        Args:
+            days: Window length in days, or several window lengths.
+            
+        Returns:
+            StatsTable with one row per habit, ordered by name.
+        """
+        windows = [days] if isinstance(days, int) else list(days)
+        rows = list(self.iter_stats(windows))
+        end_date = date.today()
+        start_date = end_date - timedelta(days=max(windows) - 1)
+        return StatsTable(
+            windows=windows,
+            months=month_keys(start_date, end_date),
+            rows=rows,
+        )
     
     def close(self) -> None:
         """Close the database connection."""
@@ -2,9 +2,49 @@
 
 from __future__ import annotations
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import date, datetime
-from typing import Optional
+from typing import List, Optional, Sequence
+
+# Operations recorded in the change log.
+CHANGE_OPS = ("habit_added", "entry_added", "entry_updated", "habit_removed")
+
+# Schedule bitmask with every weekday due; bit 0 is Monday.
+ALL_WEEKDAYS = 0b1111111
+
+
+def check_schedule(weekdays: int, weekly_target: Optional[int]) -> None:
+    """Validate a habit schedule.
+    
+    Args:
+        weekdays: Bitmask of due weekdays, bit 0 for Monday.
+        weekly_target: Completions wanted per week, or None to want one
+            on every due weekday.
+        
+    Raises:
+        ValueError: If no weekday is due, or the target is out of range.
+    """
+    if not 1 <= weekdays <= ALL_WEEKDAYS:
+        raise ValueError("A schedule needs at least one weekday")
+    
+    if weekly_target is not None and not 1 <= weekly_target <= bin(weekdays).count("1"):
+        raise ValueError("Weekly target must be between 1 and the number of scheduled weekdays")
+
+
+def check_windows(windows: Sequence[int]) -> None:
+    """Validate stats window lengths.
+    
+    Args:
+        windows: Window lengths in days.
+        
+    Raises:
+        ValueError: If there are no windows, or one is not positive.
+    """
+    if not windows:
+        raise ValueError("At least one stats window is required")
+    
+    if any(days <= 0 for days in windows):
+        raise ValueError("Stats windows must be positive")
 
 
 @dataclass
@@ -15,6 +55,8 @@ class Habit:
     name: str
     created_at: datetime
     completed_today: Optional[bool] = None
+    weekdays: int = ALL_WEEKDAYS
+    weekly_target: Optional[int] = None
     
     def __post_init__(self) -> None:
         """Validate habit data after initialization."""
@@ -23,6 +65,8 @@ class Habit:
         
         if self.id <= 0:
             raise ValueError("Habit ID must be positive")
+        
+        check_schedule(self.weekdays, self.weekly_target)
 
 
 @dataclass
@@ -33,6 +77,7 @@ class Entry:
     habit_id: int
     entry_date: date
     created_at: datetime
+    value: float = 1.0
     
     def __post_init__(self) -> None:
         """Validate entry data after initialization."""
@@ -43,4 +88,123 @@ class Entry:
             raise ValueError("Habit ID must be positive")
         
         if self.entry_date > date.today():
-            raise ValueError("Entry date cannot be in the future") 
\ No newline at end of file
+            raise ValueError("Entry date cannot be in the future")
+        
+        if self.value <= 0:
+            raise ValueError("Entry value must be positive")
+
+
+@dataclass
+class Change:
+    """Represents one row of the append-only change log.
+    
+    ``value`` is the entry's amount after an ``entry_added`` or
+    ``entry_updated`` change, and None for habit changes.
+    """
+    
+    seq: int
+    op: str
+    habit_id: int
+    habit_name: str
+    entry_date: Optional[date]
+    created_at: datetime
+    value: Optional[float] = None
+    
+    def __post_init__(self) -> None:
+        """Validate change data after initialization."""
+        if self.seq <= 0:
+            raise ValueError("Change sequence number must be positive")
+        
+        if self.op not in CHANGE_OPS:
+            raise ValueError(f"Unknown change operation '{self.op}'")
+
+
+@dataclass
+class StatsRow:
+    """Completion statistics for one habit across several windows."""
+    
+    name: str
+    rates: List[float]
+    weekdays: List[int]
+    months: List[int]
+    actual: List[int] = field(default_factory=list)
+    expected: List[float] = field(default_factory=list)
+
+
+@dataclass
+class StatsTable:
+    """Completion statistics for many habits, computed in a single scan.
+    
+    ``rows[i].rates[j]`` is the completion percentage of habit ``i`` over the
+    last ``windows[j]`` days: ``actual[j]`` completions on due days out of
+    ``expected[j]`` due by the habit's schedule. The weekday counts (Monday first) and the
+    month counts (aligned with ``months``) cover the largest window.
+    """
+    
+    windows: List[int]
+    months: List[str]
+    rows: List[StatsRow] = field(default_factory=list)
+    
+    def __post_init__(self) -> None:
+        """Validate stats table after initialization."""
+        check_windows(self.windows)
+
+
+@dataclass
+class HabitPair:
+    """Correlation between two habits, optionally with a lag in days."""
+    
+    first: str
+    second: str
+    lag: int
+    together: int
+    phi: float
+    
+    def __post_init__(self) -> None:
+        """Validate habit pair data after initialization."""
+        if self.lag < 0:
+            raise ValueError("Lag must not be negative")
+
+
+@dataclass
+class SyncResult:
+    """Number of rows copied in each direction by a database sync."""
+    
+    habits_pulled: int
+    entries_pulled: int
+    habits_pushed: int
+    entries_pushed: int
+
+
+@dataclass
+class ValueStats:
+    """Aggregates of a habit's logged amounts over a date range.
+    
+    ``average`` is per logged day, or None if nothing was logged.
+    """
+    
+    total: float
+    days: int
+    average: Optional[float]
+
+
+@dataclass
+class SnapshotResult:
+    """Outcome of writing a columnar snapshot."""
+    
+    habits: int
+    start: date
+    end: date
+    days_written: int
+    rebuilt: bool
+
+
+@dataclass
+class LockStats:
+    """Write-lock acquisition metrics for one database connection."""
+    
+    transactions: int = 0
+    retries: int = 0
+    failures: int = 0
+    wait_seconds: float = 0.0
+    max_wait_seconds: float = 0.0
\ No newline at end of file
@@ -0,0 +1,248 @@
+"""Columnar snapshots of habit history for external analytics.
+
+A snapshot is a directory of plain ``.npy`` files plus a JSON header::
+
+    header.json  format, date range, change-log cursor
+    ids.npy      habit IDs, int64, one per matrix row
+    names.npy    habit names, fixed-width unicode, one per matrix row
+    done.npy     habits x days completion bits, uint8
+
+``done.npy`` has one row per habit and one byte per 8 days, packed with
+``numpy.packbits`` (day 0 is the high bit of byte 0). It is stored in
+Fortran order so that later days come last in the file, which lets a new
+snapshot append only the days added since the previous one.
+
+Every file loads without copying::
+
+    done = numpy.load("snapshot/done.npy", mmap_mode="r")
+    matrix = numpy.unpackbits(done, axis=1, count=header["days"]).astype(bool)
+
+Requires numpy, installed with ``pip install "habit-tracker[analysis]"``.
+"""
+
+from __future__ import annotations
+
+import io
+import json
+import os
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from .analysis import completion_matrix
+from .db import HabitDatabase
+from .models import SnapshotResult
+
+SNAPSHOT_FORMAT = "habit-snapshot"
+SNAPSHOT_VERSION = 1
+
+HEADER_FILE = "header.json"
+IDS_FILE = "ids.npy"
+NAMES_FILE = "names.npy"
+MATRIX_FILE = "done.npy"
+
+
+def read_header(path: Path) -> Optional[Dict[str, Any]]:
+    """Read a snapshot's JSON header.
+    
+    Args:
+        path: Snapshot directory.
+    
+    Returns:
+        The header, or None if the directory holds no snapshot.
+    """
+    try:
+        return json.loads((Path(path) / HEADER_FILE).read_text())
+    except FileNotFoundError:
+        return None
+
+
+def load_snapshot(path: Path) -> Tuple[Dict[str, Any], np.ndarray, np.ndarray, np.ndarray]:
+    """Open a snapshot with every array memory-mapped read-only.
+    
+    Args:
+        path: Snapshot directory.
+    
+    Returns:
+        The header, habit IDs, habit names, and the bit-packed habits x
+        days matrix.
+    
+    Raises:
+        ValueError: If the directory holds no snapshot.
+    """
+    path = Path(path)
+    header = read_header(path)
+    if header is None or header.get("format") != SNAPSHOT_FORMAT:
+        raise ValueError(f"No snapshot found in {path}")
+    return (
+        header,
+        np.load(path / IDS_FILE, mmap_mode="r"),
+        np.load(path / NAMES_FILE, mmap_mode="r"),
+        np.load(path / MATRIX_FILE, mmap_mode="r"),
+    )
+
+
+def write_snapshot(
+    db: HabitDatabase,
+    path: Path,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+) -> SnapshotResult:
+    """Write or extend a columnar snapshot of the database.
+    
+    If ``path`` already holds a snapshot of the same database with the same
+    start day, only the days after its end (and any earlier days that gained
+    entries since, according to the change log) are rewritten. Adding or
+    removing habits changes every column, so it rebuilds the snapshot.
+    
+    Args:
+        db: Database to read.
+        path: Snapshot directory, created if needed.
+        start: First day. Defaults to the existing snapshot's start, or the
+            earliest entry.
+        end: Last day, inclusive. Defaults to today.
+    
+    Returns:
+        What was written.
+    
+    Raises:
+        ValueError: If the start day is after the end day.
+    """
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    end = end or date.today()
+    
+    # Read the cursor first: anything committed after it is replayed next time
+    cursor = db.last_change_seq()
+    database_id = db.database_id()
+    
+    # Only an existing snapshot of this database can be extended or kept
+    header = read_header(path)
+    if header is not None and not _is_snapshot_of(header, database_id):
+        header = None
+    first_dirty = _first_dirty_day(db, header, start, end) if header is not None else None
+    if header is not None and first_dirty is not None:
+        snapshot_start = date.fromisoformat(header["start"])
+        # Rewrite from the start of the byte holding the first dirty day
+        first_column = (first_dirty - snapshot_start).days // 8
+        rewrite_from = snapshot_start + timedelta(days=first_column * 8)
+        if rewrite_from > end:
+            _write_header(path, database_id, cursor, snapshot_start, end, header["habits"])
+            return SnapshotResult(header["habits"], snapshot_start, end, 0, rebuilt=False)
+        
+        ids, _, matrix = completion_matrix(db, rewrite_from, end)
+        stored_ids = np.load(path / IDS_FILE, mmap_mode="r")
+        if ids == stored_ids.tolist() and _write_matrix(
+            path / MATRIX_FILE, np.packbits(matrix, axis=1), first_column
+        ):
+            days_written = matrix.shape[1]
+            _write_header(path, database_id, cursor, snapshot_start, end, len(ids))
+            return SnapshotResult(len(ids), snapshot_start, end, days_written, rebuilt=False)
+    
+    if start is None and header is not None:
+        # Keep the columns downstream readers already index by
+        start = date.fromisoformat(header["start"])
+    if start is None:
+        start = db.first_entry_date() or end
+    if start > end:
+        raise ValueError("The start day must not be after the end day")
+    
+    # Drop the header first so an interrupted rebuild is never mistaken for
+    # a valid snapshot
+    (path / HEADER_FILE).unlink(missing_ok=True)
+    ids, names, matrix = completion_matrix(db, start, end)
+    np.save(path / IDS_FILE, np.array(ids, dtype=np.int64))
+    np.save(path / NAMES_FILE, np.array(names, dtype=str))
+    _write_matrix(path / MATRIX_FILE, np.packbits(matrix, axis=1), 0)
+    _write_header(path, database_id, cursor, start, end, len(ids))
+    return SnapshotResult(len(ids), start, end, matrix.shape[1], rebuilt=True)
+
+
+def _is_snapshot_of(header: Dict[str, Any], database_id: str) -> bool:
+    """Check that a header describes a current-version snapshot of the database."""
+    return (
+        header.get("format") == SNAPSHOT_FORMAT
+        and header.get("version") == SNAPSHOT_VERSION
+        and header.get("database_id") == database_id
+    )
+
+
+def _first_dirty_day(
+    db: HabitDatabase, header: Dict[str, Any], start: Optional[date], end: date,
+) -> Optional[date]:
+    """Find the first day a snapshot of this database needs rewritten from.
+    
+    Returns:
+        The day, or None if the snapshot must be rebuilt.
+    """
+    if (
+        (start is not None and start.isoformat() != header["start"])
+        or end.isoformat() < header["end"]
+    ):
+        return None
+    
+    habits_changed, earliest = db.summarize_changes_since(header["change_cursor"])
+    if habits_changed:
+        return None
+    
+    first_dirty = date.fromisoformat(header["end"]) + timedelta(days=1)
+    if earliest is not None:
+        first_dirty = min(first_dirty, earliest)
+    if first_dirty < date.fromisoformat(header["start"]):
+        return None
+    return first_dirty
+
+
+def _write_matrix(file: Path, packed: np.ndarray, first_column: int) -> bool:
+    """Write packed columns into ``done.npy`` from ``first_column`` on.
+    
+    Columns before ``first_column`` are kept, so only the tail of the file
+    is written.
+    
+    Returns:
+        False if the file's header would change size, in which case nothing
+        is written and the snapshot must be rebuilt.
+    """
+    rows, columns = packed.shape
+    array_header = {
+        "descr": np.lib.format.dtype_to_descr(np.dtype(np.uint8)),
+        "fortran_order": True,
+        "shape": (rows, first_column + columns),
+    }
+    # numpy pads the header so the last dimension can grow in place
+    header_bytes = io.BytesIO()
+    np.lib.format.write_array_header_1_0(header_bytes, array_header)
+    with open(file, "r+b" if first_column else "wb") as f:
+        if first_column:
+            np.lib.format.read_magic(f)
+            np.lib.format.read_array_header_1_0(f)
+            if f.tell() != len(header_bytes.getvalue()):
+                return False
+            f.seek(0)
+        f.write(header_bytes.getvalue())
+        f.seek(f.tell() + first_column * rows)
+        f.write(packed.tobytes(order="F"))
+        f.truncate()
+    return True
+
+
+def _write_header(
+    path: Path, database_id: str, cursor: int, start: date, end: date, habits: int
+) -> None:
+    """Atomically replace the snapshot's JSON header."""
+    header = {
+        "format": SNAPSHOT_FORMAT,
+        "version": SNAPSHOT_VERSION,
+        "database_id": database_id,
+        "change_cursor": cursor,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "habits": habits,
+        "days": (end - start).days + 1,
+        "bit_order": "big",
+    }
+    temp = path / f"{HEADER_FILE}.tmp"
+    temp.write_text(json.dumps(header, indent=2) + "\n")
+    os.replace(temp, path / HEADER_FILE)
@@ -0,0 +1,259 @@
+"""Curses dashboard for the habit tracker."""
+
+from __future__ import annotations
+
+import curses
+import sqlite3
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+
+from .db import HabitDatabase
+from .models import ALL_WEEKDAYS
+
+# How often the dashboard checks the database for changes, in milliseconds.
+POLL_INTERVAL_MS = 1000
+
+NAME_WIDTH = 30
+
+
+class Dashboard:
+    """State behind the ``habit tui`` screen.
+    
+    The database is only re-queried when ``PRAGMA data_version`` reports a
+    commit from another connection. Even then, only entries added since the
+    last refresh are read, and only habits with new entries are marked for
+    redraw. Drawn cell text is cached so unchanged cells are never rewritten.
+    """
+    
+    def __init__(self, db: HabitDatabase, days: int = 7) -> None:
+        """Initialize dashboard state.
+        
+        Args:
+            db: Database to display.
+            days: Number of days shown per habit, ending today.
+        
+        Raises:
+            ValueError: If ``days`` is less than 1.
+        """
+        if days < 1:
+            raise ValueError("The dashboard must show at least one day")
+        self.db = db
+        self.days = days
+        self.habits: List[Tuple[int, str]] = []
+        # Due weekdays and weekly target of each habit
+        self.schedules: Dict[int, Tuple[int, Optional[int]]] = {}
+        self.done: Dict[int, Set[date]] = {}
+        self.end_date: Optional[date] = None
+        self._data_version: Optional[int] = None
+        self._habit_signature: Optional[Tuple[int, int, int]] = None
+        self._entry_watermark = 0
+        self._drawn: Dict[Tuple[int, int], Tuple[str, int]] = {}
+        # Shown in the status line instead of the key help, e.g. after an error
+        self.message: Optional[str] = None
+    
+    @property
+    def start_date(self) -> date:
+        """First day shown on the dashboard."""
+        assert self.end_date is not None
+        return self.end_date - timedelta(days=self.days - 1)
+    
+    def refresh(self, force: bool = False) -> Set[int]:
+        """Re-read whatever changed since the last refresh.
+        
+        Args:
+            force: Check for changes even if ``data_version`` is unchanged,
+                e.g. after a write made through this dashboard's connection.
+        
+        Returns:
+            IDs of habits whose rows changed.
+        """
+        version = self.db.data_version()
+        if date.today() != self.end_date:
+            return self._reload()
+        if version == self._data_version and not force:
+            return set()
+        self._data_version = version
+        
+        changed: Set[int] = set()
+        if self.db.habit_signature() != self._habit_signature:
+            changed |= self._reload_habits()
+        
+        for entry in self.db.entries_since(self._entry_watermark):
+            if entry.habit_id in self.done and entry.entry_date >= self.start_date:
+                self.done[entry.habit_id].add(entry.entry_date)
+                changed.add(entry.habit_id)
+            self._entry_watermark = entry.id
+        
+        return changed
+    
+    def _reload(self) -> Set[int]:
+        """Reload every habit and the whole window, e.g. after midnight."""
+        self.end_date = date.today()
+        self._data_version = self.db.data_version()
+        self.habits, self.done, self._habit_signature = [], {}, None
+        self._entry_watermark = self.db.last_entry_id()
+        self._reload_habits()
+        return set(self.done)
+    
+    def _reload_habits(self) -> Set[int]:
+        """Re-read the habit list and load the window of any new habits.
+        
+        Returns:
+            IDs of all habits, since rows may have shifted position.
+        """
+        self._habit_signature = self.db.habit_signature()
+        habits = [*self.db.iter_habits()]
+        self.habits = [(habit.id, habit.name) for habit in habits]
+        self.schedules = {habit.id: (habit.weekdays, habit.weekly_target) for habit in habits}
+        
+        known = {habit_id: self.done.get(habit_id) for habit_id, _ in self.habits}
+        new_ids = [habit_id for habit_id, days in known.items() if days is None]
+        self.done = {habit_id: days or set() for habit_id, days in known.items()}
+        if new_ids:
+            start_date, end_date = self.start_date, self.end_date
+            assert end_date is not None
+            for habit_id, offset in self.db.completion_offsets(
+                start_date, end_date, habit_ids=new_ids
+            ):
+                self.done[habit_id].add(start_date + timedelta(days=offset))
+        
+        return set(self.done)
+    
+    def row_cells(self, habit_id: int, name: str) -> List[str]:
+        """Render the cells of one habit row: name, one mark per day, rate."""
+        days = self.done.get(habit_id, set())
+        marks = [
+            "✔" if self.start_date + timedelta(days=offset) in days else "·"
+            for offset in range(self.days)
+        ]
+        return [name[:NAME_WIDTH].ljust(NAME_WIDTH), *marks, f"{self.rate(habit_id):5.1f}%"]
+    
+    def rate(self, habit_id: int) -> float:
+        """Completion rate of a habit over the shown days, as ``habit stats`` counts it.
+        
+        Only completions on due weekdays count. With a weekly target, each
+        7-day block ending today counts at most the target, against an
+        expected ``weekly_target`` per 7 days.
+        """
+        assert self.end_date is not None
+        weekdays, weekly_target = self.schedules.get(habit_id, (ALL_WEEKDAYS, None))
+        done = [0] * ((self.days + 6) // 7)
+        for day in self.done.get(habit_id, ()):
+            if self.start_date <= day <= self.end_date and weekdays >> day.weekday() & 1:
+                done[(self.end_date - day).days // 7] += 1
+        
+        expected: float
+        if weekly_target is None:
+            actual = sum(done)
+            expected = sum(
+                weekdays >> (self.start_date + timedelta(days=offset)).weekday() & 1
+                for offset in range(self.days)
+            )
+        else:
+            actual = sum(min(count, weekly_target) for count in done)
+            expected = weekly_target * self.days / 7
+        return min(actual / expected * 100, 100.0) if expected else 100.0
+    
+    def header_cells(self) -> List[str]:
+        """Render the header row: a title and the weekday initial of each day."""
+        initials = [
+            (self.start_date + timedelta(days=offset)).strftime("%a")[0]
+            for offset in range(self.days)
+        ]
+        return ["Habit".ljust(NAME_WIDTH), *initials, "  Rate"]
+    
+    def draw(self, screen: "curses.window", top: int, selected: int) -> None:
+        """Write the visible rows to the screen, skipping unchanged cells.
+        
+        Args:
+            screen: Curses window to draw on.
+            top: Index of the first habit shown.
+            selected: Index of the highlighted habit.
+        """
+        height, width = screen.getmaxyx()
+        rows = [(self.header_cells(), curses.A_BOLD)]
+        for index in range(top, min(top + height - 2, len(self.habits))):
+            habit_id, name = self.habits[index]
+            attr = curses.A_REVERSE if index == selected else curses.A_NORMAL
+            rows.append((self.row_cells(habit_id, name), attr))
+        
+        for y in range(height - 1):
+            cells, attr = rows[y] if y < len(rows) else ([], curses.A_NORMAL)
+            x = 0
+            for col, text in enumerate(cells + [""]):
+                if col == len(cells):
+                    # Blank the rest of the line when the row got shorter
+                    text = " " * max(width - x - 1, 0)
+                if self._drawn.get((y, col)) != (text, attr) and x < width - 1:
+                    screen.addnstr(y, x, text, width - x - 1, attr)
+                    self._drawn[(y, col)] = (text, attr)
+                    if col == len(cells):
+                        # Cells the blank covered must be redrawn if they return
+                        for key in [key for key in self._drawn if key[0] == y and key[1] > col]:
+                            del self._drawn[key]
+                x += len(text) + 1
+        
+        # Padded so a shorter status fully covers the previous one
+        status = (self.message or "q quit  ↑/↓ move  d mark done").ljust(width - 1)
+        if self._drawn.get((height - 1, 0)) != (status, curses.A_DIM):
+            screen.addnstr(height - 1, 0, status, width - 1, curses.A_DIM)
+            self._drawn[(height - 1, 0)] = (status, curses.A_DIM)
+    
+    def invalidate(self) -> None:
+        """Forget drawn cells so the next draw repaints the whole screen."""
+        self._drawn.clear()
+
+
+def run(screen: "curses.window", db: HabitDatabase, days: int = 7) -> None:
+    """Run the dashboard until the user quits.
+    
+    Args:
+        screen: Curses window provided by ``curses.wrapper``.
+        db: Database to display.
+        days: Number of days shown per habit.
+    """
+    curses.curs_set(0)
+    screen.timeout(POLL_INTERVAL_MS)
+    dashboard = Dashboard(db, days)
+    dashboard.refresh()
+    top = selected = 0
+    dirty = True
+    
+    while True:
+        height = screen.getmaxyx()[0]
+        if dirty:
+            dashboard.draw(screen, top, selected)
+            screen.refresh()
+            dirty = False
+        
+        key = screen.getch()
+        if key in (ord("q"), 27):
+            return
+        if key == curses.KEY_RESIZE:
+            screen.clear()
+            dashboard.invalidate()
+        elif key in (curses.KEY_DOWN, ord("j")):
+            selected = min(selected + 1, len(dashboard.habits) - 1)
+        elif key in (curses.KEY_UP, ord("k")):
+            selected = max(selected - 1, 0)
+        elif key == ord("d") and dashboard.habits:
+            try:
+                db.mark_habit_done(dashboard.habits[selected][1])
+                dashboard.message = None
+            except (ValueError, sqlite3.OperationalError) as e:
+                # The habit was removed since the last poll, or another
+                # process held the write lock for LOCK_TIMEOUT
+                dashboard.message = f"Not marked done: {e}"
+            dashboard.refresh(force=True)
+            selected = min(selected, max(len(dashboard.habits) - 1, 0))
+        elif dashboard.refresh():
+            dirty = True
+            selected = min(selected, max(len(dashboard.habits) - 1, 0))
+            continue
+        else:
+            continue
+        
+        # Keep the selected habit inside the visible rows
+        visible = max(height - 2, 1)
+        top = min(max(top, selected - visible + 1), selected)
+        dirty = True
@@ -35,6 +35,9 @@ setup(
         ],
     },
     extras_require={
+        "analysis": [
+            "numpy==1.26.4",
+        ],
         "dev": [
             "pytest==8.0.0",
             "black==24.1.1",
@@ -0,0 +1,92 @@
+"""Unit tests for the analysis module."""
+
+import math
+from datetime import date, timedelta
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from habit.analysis import completion_matrix, correlate
+from habit.db import HabitDatabase
+
+
+def brute_force_phi(a, b):
+    """Compute the phi coefficient of two boolean sequences directly."""
+    n = len(a)
+    n11 = sum(x and y for x, y in zip(a, b))
+    n1_, n_1 = sum(a), sum(b)
+    return (n * n11 - n1_ * n_1) / math.sqrt(n1_ * (n - n1_) * n_1 * (n - n_1))
+
+
+class TestAnalysis:
+    """Test cases for correlation analysis."""
+    
+    @pytest.fixture
+    def db(self, tmp_path):
+        """Create a database with three habits over ten days."""
+        db = HabitDatabase(tmp_path / "test_habits.db")
+        db.init_database()
+        self.start = date.today() - timedelta(days=9)
+        self.pattern = {
+            "Read": [1, 1, 0, 1, 0, 1, 1, 0, 1, 0],
+            "Run":  [1, 1, 0, 1, 0, 1, 0, 0, 1, 0],
+            "Swim": [0, 1, 1, 0, 1, 0, 1, 1, 0, 1],
+        }
+        conn = db._get_connection()
+        for name, days in self.pattern.items():
+            habit = db.add_habit(name)
+            conn.executemany(
+                "INSERT INTO entries (habit_id, entry_date) VALUES (?, ?)",
+                [(habit.id, self.start + timedelta(days=d)) for d, done in enumerate(days) if done]
+            )
+        conn.commit()
+        yield db
+        db.close()
+    
+    def test_completion_matrix(self, db):
+        """Test that the matrix matches the recorded entries."""
+        ids, names, matrix = completion_matrix(db, self.start, date.today())
+        
+        assert names == ["Read", "Run", "Swim"]
+        assert len(ids) == 3
+        assert matrix.shape == (3, 10)
+        assert matrix.astype(int).tolist() == [self.pattern[name] for name in names]
+    
+    def test_correlate_matches_brute_force(self, db):
+        """Test that phi and co-occurrence counts match a direct computation."""
+        pairs = correlate(db, self.start, date.today(), top=3)
+        
+        assert [(p.first, p.second) for p in pairs][0] == ("Read", "Run")
+        assert [p.phi for p in pairs] == sorted((p.phi for p in pairs), reverse=True)
+        for pair in pairs:
+            a, b = self.pattern[pair.first], self.pattern[pair.second]
+            assert pair.phi == pytest.approx(brute_force_phi(a, b))
+            assert pair.together == sum(x and y for x, y in zip(a, b))
+    
+    def test_correlate_with_lag(self, db):
+        """Test that a lag pairs each day of one habit with the next day of another."""
+        pairs = correlate(db, self.start, date.today(), lag=1, top=1)
+        
+        assert len(pairs) == 1
+        pair = pairs[0]
+        a, b = self.pattern[pair.first][:-1], self.pattern[pair.second][1:]
+        assert pair.lag == 1
+        assert pair.phi == pytest.approx(brute_force_phi(a, b))
+        assert pair.phi == max(
+            brute_force_phi(self.pattern[x][:-1], self.pattern[y][1:])
+            for x in self.pattern for y in self.pattern if x != y
+        )
+    
+    def test_correlate_blocks_give_same_result(self, db):
+        """Test that splitting the matrix into blocks doesn't change the answer."""
+        expected = correlate(db, self.start, date.today(), top=3)
+        
+        with pytest.MonkeyPatch.context() as mp:
+            mp.setattr("habit.analysis.BLOCK_SIZE", 1)
+            assert correlate(db, self.start, date.today(), top=3) == expected
+    
+    def test_correlate_invalid_window_raises_error(self, db):
+        """Test that a window no longer than the lag raises ValueError."""
+        with pytest.raises(ValueError, match="The window must be longer than the lag"):
+            correlate(db, date.today(), date.today(), lag=1)
@@ -1,10 +1,17 @@
 """Unit tests for the CLI module."""
 
+import sqlite3
+
 import pytest
 from click.testing import CliRunner
+from datetime import date, datetime
 from unittest.mock import patch, MagicMock
 
 from habit.cli import main
+from habit.models import (
+    ALL_WEEKDAYS, Change, Entry, Habit, HabitPair, SnapshotResult, StatsRow, SyncResult,
+    ValueStats,
+)
 
 
 class TestCLI:
@@ -40,7 +47,90 @@ class TestCLI:
             
             assert result.exit_code == 0
             assert "✅ Added habit: Test Habit" in result.output
-            mock_db.add_habit.assert_called_once_with("Test Habit")
+            mock_db.add_habit.assert_called_once_with(
+                "Test Habit", weekdays=ALL_WEEKDAYS, weekly_target=None
+            )
+    
+    def test_add_command_with_schedule(self, runner):
+        """Test that --on and --per-week set the habit's schedule."""
+        with patch('habit.cli.HabitDatabase') as mock_db_class:
+            mock_db = mock_db_class.return_value
+            mock_db.add_habit.return_value = Habit(
+                1, "Gym", datetime.now(), weekdays=0b0010101, weekly_target=2
+            )
+            
+            result = runner.invoke(main, ['add', 'Gym', '--on', 'mon,Wed,friday', '--per-week', '2'])
+            
+            assert result.exit_code == 0
+            assert "✅ Added habit: Gym (2× per week on Mon, Wed, Fri)" in result.output
+            mock_db.add_habit.assert_called_once_with("Gym", weekdays=0b0010101, weekly_target=2)
+    
+    def test_add_command_unknown_weekday(self, runner):
+        """Test that an unknown weekday is rejected before touching the database."""
+        with patch('habit.cli.HabitDatabase') as mock_db_class:
+            result = runner.invoke(main, ['add', 'Gym', '--on', 'mon,someday'])
+            
+            assert result.exit_code != 0
+            assert "unknown weekday 'someday'" in result.output
+            mock_db_class.return_value.add_habit.assert_not_called()
+    
+    def test_schedule_command(self, runner):
+        """Test that the schedule command resolves the name and sets the schedule."""
+        with patch('habit.cli.HabitDatabase') as mock_db_class:
+            mock_db = mock_db_class.return_value
+            mock_db.resolve_habit.return_value = Habit(1, "Gym", datetime.now())
+            mock_db.set_schedule.return_value = Habit(
+                1, "Gym", datetime.now(), weekdays=0b1100000
+            )
+            
+            result = runner.invoke(main, ['schedule', 'gy', '--on', 'sat,sun'])
+            
+            assert result.exit_code == 0
+            assert "📅 'Gym' is now due on Sat, Sun" in result.output
+            mock_db.set_schedule.assert_called_once_with("Gym", 0b1100000, None)
+    
+    def test_log_command(self, runner):
+        """Test that the log command resolves the name and reports today's total."""
+        with patch('habit.cli.HabitDatabase') as mock_db_class:
+            mock_db = mock_db_class.return_value
+            mock_db.resolve_habit.return_value = Habit(1, "Water", datetime.now())
+            mock_db.log_amount.return_value = Entry(1, 1, date.today(), datetime.now(), value=6)
+            
+            result = runner.invoke(main, ['log', 'wat', '2.5'])
+            
+            assert result.exit_code == 0
+            assert "📝 Logged 2.5 for 'Water' (6 today)" in result.output
+            mock_db.log_amount.assert_called_once_with("Water", 2.5)
+    
+    def test_log_command_rejects_zero(self, runner):
+        """Test that a zero amount is rejected by argument parsing."""
+        with patch('habit.cli.HabitDatabase') as mock_db_class:
+            result = runner.invoke(main, ['log', 'Water', '0'])
+            
+            assert result.exit_code != 0
+            mock_db_class.return_value.log_amount.assert_not_called()
+    
+    def test_values_command(self, runner):
+        """Test that the values command prints totals and all-time percentiles."""
+        with patch('habit.cli.HabitDatabase') as mock_db_class:
+            mock_db = mock_db_class.return_value
+            mock_db.iter_habits.return_value = iter([
+                Habit(1, "Idle", datetime.now()), Habit(2, "Water", datetime.now())
+            ])
+            mock_db.value_stats.return_value = [
+                ValueStats(0.0, 0, None),
+                ValueStats(180.0, 30, 6.0),
+            ]
+            mock_db.value_percentiles.return_value = [{}, {50: 6.0, 90: 8.0}]
+            
+            result = runner.invoke(main, ['values', '--days', '30'])
+            
+            assert result.exit_code == 0
+            assert "Idle: nothing logged" in result.output
+            assert ("Water: 180 total, 6.0 per day over 30 logged days · all-time p50 6, p90 8"
+                    in result.output)
+            assert mock_db.value_stats.call_args.args[0] == [1, 2]
+            mock_db.value_percentiles.assert_called_once_with([1, 2])
     
     def test_add_command_error(self, runner):
         """Test the add command with error."""
@@ -58,6 +148,7 @@ class TestCLI:
         """Test the done command with success."""
         with patch('habit.cli.HabitDatabase') as mock_db_class:
             mock_db = MagicMock()
+            mock_db.resolve_habit.return_value.name = "Test Habit"
             mock_db.mark_habit_done.return_value = MagicMock()
             mock_db_class.return_value = mock_db
             
@@ -71,7 +162,7 @@ class TestCLI:
         """Test the done command with error."""
         with patch('habit.cli.HabitDatabase') as mock_db_class:
             mock_db = MagicMock()
-            mock_db.mark_habit_done.side_effect = ValueError("Habit 'Test Habit' not found")
+            mock_db.resolve_habit.side_effect = ValueError("Habit 'Test Habit' not found")
             mock_db_class.return_value = mock_db
             
             result = runner.invoke(main, ['done', 'Test Habit'])
@@ -79,11 +170,79 @@ class TestCLI:
             assert result.exit_code == 0
             assert "❌ Error: Habit 'Test Habit' not found" in result.output
     
+    def test_remove_command_success(self, runner):
+        """Test the remove command with names and a glob."""
+        with patch('habit.cli.HabitDatabase') as mock_db_class:
+            mock_db = MagicMock()
+            mock_db.resolve_habit.return_value.name = "Run"
+            mock_db.remove_habits.return_value = ["Read", "Run"]
+            mock_db_class.return_value = mock_db
+            
+            result = runner.invoke(main, ['remove', 'Run', '--glob', 'Re*', '--yes'])
+            
+            assert result.exit_code == 0
+            assert "Removed habit: Read" in result.output
+            assert "Removed habit: Run" in result.output
+            mock_db.remove_habits.assert_called_once_with(("Run",), pattern="Re*", vacuum=False)
+            # Without a prompt, misspellings must not select a habit to delete
+            mock_db.resolve_habit.assert_called_once_with("Run", fuzzy=False)
+    
+    def test_remove_command_requires_confirmation(self, runner):
+        """Test that remove aborts unless confirmed."""
+        with patch('habit.cli.HabitDatabase') as mock_db_class:
+            mock_db = MagicMock()
+            mock_db_class.return_value = mock_db
+            
+            result = runner.invoke(main, ['remove', 'Run'], input="n\n")
+            
+            assert result.exit_code != 0
+            mock_db.resolve_habit.assert_called_once_with("Run", fuzzy=True)
+            mock_db.remove_habits.assert_not_called()
+    
+    def test_remove_command_error(self, runner):
+        """Test the remove command with an unknown habit."""
+        with patch('habit.cli.HabitDatabase') as mock_db_class:
+            mock_db = MagicMock()
+            mock_db.resolve_habit.side_effect = ValueError("Habit 'Run' not found")
+            mock_db_class.return_value = mock_db
+            
+            result = runner.invoke(main, ['remove', 'Run', '--yes'])
+            
+            assert result.exit_code == 0
+            assert "❌ Error: Habit 'Run' not found" in result.output
+    
+    def test_remove_command_lock_timeout(self, runner):
+        """Test that a write-lock timeout during removal is reported."""
+        with patch('habit.cli.HabitDatabase') as mock_db_class:
+            mock_db = MagicMock()
+            mock_db.resolve_habit.return_value.name = "Run"
+            mock_db.remove_habits.side_effect = sqlite3.OperationalError("database is locked")
+            mock_db_class.return_value = mock_db
+            
+            result = runner.invoke(main, ['remove', 'Run', '--yes'])
+            
+            assert result.exit_code == 0
+            assert "❌ Error: database is locked" in result.output
+    
+    def test_done_command_resolves_prefix(self, runner):
+        """Test that done marks the habit resolved from a prefix or typo."""
+        with patch('habit.cli.HabitDatabase') as mock_db_class:
+            mock_db = MagicMock()
+            mock_db.resolve_habit.return_value.name = "Morning meditation"
+            mock_db_class.return_value = mock_db
+            
+            result = runner.invoke(main, ['done', 'Morn'])
+            
+            assert result.exit_code == 0
+            assert "✅ Marked 'Morning meditation' as done for today!" in result.output
+            mock_db.resolve_habit.assert_called_once_with("Morn")
+            mock_db.mark_habit_done.assert_called_once_with("Morning meditation")
+    
     def test_list_command_empty(self, runner):
         """Test the list command when no habits exist."""
         with patch('habit.cli.HabitDatabase') as mock_db_class:
             mock_db = MagicMock()
-            mock_db.list_habits.return_value = []
+            mock_db.iter_habits.return_value = []
             mock_db_class.return_value = mock_db
             
             result = runner.invoke(main, ['list'])
@@ -91,6 +250,19 @@ class TestCLI:
             assert result.exit_code == 0
             assert "No habits found. Use 'habit add <name>' to create your first habit." in result.output
     
+    def test_list_command_error(self, runner):
+        """Test the list command on a database that needs upgrading."""
+        with patch('habit.cli.HabitDatabase') as mock_db_class:
+            mock_db = MagicMock()
+            mock_db.iter_habits.side_effect = ValueError("run 'habit init'")
+            mock_db_class.return_value = mock_db
+            
+            result = runner.invoke(main, ['list'])
+            
+            assert result.exit_code == 0
+            assert "❌ Error: run 'habit init'" in result.output
+            assert "No habits found" not in result.output
+    
     def test_list_command_with_habits(self, runner):
         """Test the list command with habits."""
         with patch('habit.cli.HabitDatabase') as mock_db_class:
@@ -105,7 +277,7 @@ class TestCLI:
             habit2.name = "Habit 2"
             habit2.completed_today = False
             
-            mock_db.list_habits.return_value = [habit1, habit2]
+            mock_db.iter_habits.return_value = [habit1, habit2]
             mock_db_class.return_value = mock_db
             
             result = runner.invoke(main, ['list'])
@@ -118,19 +290,20 @@ class TestCLI:
         """Test the list command with --all flag."""
         with patch('habit.cli.HabitDatabase') as mock_db_class:
             mock_db = MagicMock()
-            mock_db.list_habits.return_value = []
+            mock_db.iter_habits.return_value = []
             mock_db_class.return_value = mock_db
             
             result = runner.invoke(main, ['list', '--all'])
             
             assert result.exit_code == 0
-            mock_db.list_habits.assert_called_once_with(show_all=True)
+            assert "deprecated" in result.output
+            mock_db.iter_habits.assert_called_once_with(after=None, limit=None)
     
     def test_stats_command_empty(self, runner):
         """Test the stats command when no habits exist."""
         with patch('habit.cli.HabitDatabase') as mock_db_class:
             mock_db = MagicMock()
-            mock_db.get_stats.return_value = []
+            mock_db.iter_stats.return_value = []
             mock_db_class.return_value = mock_db
             
             result = runner.invoke(main, ['stats'])
@@ -142,9 +315,9 @@ class TestCLI:
         """Test the stats command with data."""
         with patch('habit.cli.HabitDatabase') as mock_db_class:
             mock_db = MagicMock()
-            mock_db.get_stats.return_value = [
-                ("Test Habit", 75.0),
-                ("Another Habit", 25.0)
+            mock_db.iter_stats.return_value = [
+                StatsRow("Test Habit", [75.0], [0] * 7, [0]),
+                StatsRow("Another Habit", [25.0], [0] * 7, [0])
             ]
             mock_db_class.return_value = mock_db
             
@@ -156,19 +329,188 @@ class TestCLI:
             assert "75.0%" in result.output
             assert "Another Habit:" in result.output
             assert "25.0%" in result.output
-            mock_db.get_stats.assert_called_once_with(7)
+            mock_db.iter_stats.assert_called_once_with((7,), after=None, limit=None, names=None)
     
     def test_stats_command_default_days(self, runner):
         """Test the stats command with default days."""
         with patch('habit.cli.HabitDatabase') as mock_db_class:
             mock_db = MagicMock()
-            mock_db.get_stats.return_value = []
+            mock_db.iter_stats.return_value = []
             mock_db_class.return_value = mock_db
             
             result = runner.invoke(main, ['stats'])
             
             assert result.exit_code == 0
-            mock_db.get_stats.assert_called_once_with(7)  # Default value
+            mock_db.iter_stats.assert_called_once_with((7,), after=None, limit=None, names=None)  # Default value
+    
+    def test_list_command_pagination_options(self, runner):
+        """Test that --limit and --after are passed through to iter_habits."""
+        with patch('habit.cli.HabitDatabase') as mock_db_class:
+            mock_db = MagicMock()
+            mock_db.iter_habits.return_value = []
+            mock_db_class.return_value = mock_db
+            
+            result = runner.invoke(main, ['list', '--limit', '5', '--after', 'Habit 1'])
+            
+            assert result.exit_code == 0
+            mock_db.iter_habits.assert_called_once_with(after="Habit 1", limit=5)
+    
+    def test_stats_command_pagination_options(self, runner):
+        """Test that --limit and --after are passed through to iter_stats."""
+        with patch('habit.cli.HabitDatabase') as mock_db_class:
+            mock_db = MagicMock()
+            mock_db.iter_stats.return_value = [StatsRow("Test Habit", [50.0], [0] * 7, [0])]
+            mock_db_class.return_value = mock_db
+            
+            result = runner.invoke(main, ['stats', '--days', '2', '--limit', '1', '--after', 'A'])
+            
+            assert result.exit_code == 0
+            assert "📊 Stats for the last 2 days:" in result.output
+            assert "50.0%" in result.output
+            mock_db.iter_stats.assert_called_once_with((2,), after="A", limit=1, names=None)
+    
+    def test_stats_command_multiple_windows(self, runner):
+        """Test the stats command with several comma-separated windows."""
+        with patch('habit.cli.HabitDatabase') as mock_db_class:
+            mock_db = MagicMock()
+            mock_db.iter_stats.return_value = [
+                StatsRow("Test Habit", [100.0, 25.0], [1, 0, 0, 0, 0, 0, 1], [2])
+            ]
+            mock_db_class.return_value = mock_db
+            
+            result = runner.invoke(main, ['stats', '--days', '7,30', '--breakdown', 'weekday'])
+            
+            assert result.exit_code == 0
+            assert "📊 Stats for the last 7/30 days:" in result.output
+            assert "7d 100.0%  30d 25.0%" in result.output
+            assert "Mon 1  Tue 0" in result.output
+            assert "Sun 1" in result.output
+            mock_db.iter_stats.assert_called_once_with((7, 30), after=None, limit=None, names=None)
+    
+    def test_stats_command_habit_filter(self, runner):
+        """Test that --habit names are resolved and passed to iter_stats."""
+        with patch('habit.cli.HabitDatabase') as mock_db_class:
+            mock_db = MagicMock()
+            mock_db.resolve_habit.return_value.name = "Read"
+            mock_db.iter_stats.return_value = []
+            mock_db_class.return_value = mock_db
+            
+            result = runner.invoke(main, ['stats', '--habit', 'Raed'])
+            
+            assert result.exit_code == 0
+            mock_db.iter_stats.assert_called_once_with((7,), after=None, limit=None, names=["Read"])
+    
+    def test_stats_command_invalid_windows(self, runner):
+        """Test that malformed --days values are rejected."""
+        with patch('habit.cli.HabitDatabase'):
+            result = runner.invoke(main, ['stats', '--days', '7,abc'])
+            
+            assert result.exit_code != 0
+            assert "Invalid value for '--days'" in result.output
+    
+    def test_changes_command(self, runner):
+        """Test that the changes command prints the log from a cursor."""
+        with patch('habit.cli.HabitDatabase') as mock_db_class:
+            mock_db = MagicMock()
+            mock_db.changes_since.return_value = [
+                Change(4, "entry_added", 2, "Read", date.today(), datetime.now(), 1.0),
+                Change(5, "entry_updated", 2, "Read", date.today(), datetime.now(), 2.5),
+                Change(6, "habit_removed", 2, "Read", None, datetime.now()),
+            ]
+            mock_db_class.return_value = mock_db
+            
+            result = runner.invoke(main, ['changes', '--since', '3'])
+            
+            assert result.exit_code == 0
+            today = date.today().isoformat()
+            assert f"4\tentry_added\t2\tRead\t{today}\t1\n" in result.output
+            assert f"5\tentry_updated\t2\tRead\t{today}\t2.5\n" in result.output
+            assert "6\thabit_removed\t2\tRead\t\t\n" in result.output
+            mock_db.changes_since.assert_called_once_with(3, 500)
+    
+    @pytest.mark.parametrize("command", ["list", "stats"])
+    def test_limit_must_be_positive(self, runner, command):
+        """Test that list and stats reject a limit below 1."""
+        for limit in ("0", "-1"):
+            result = runner.invoke(main, [command, '--limit', limit])
+            
+            assert result.exit_code != 0
+            assert "Invalid value for '--limit'" in result.output
+    
+    def test_changes_command_rejects_zero_limit(self, runner):
+        """Test that an empty batch size is rejected instead of looping forever."""
+        result = runner.invoke(main, ['changes', '--limit', '0'])
+        
+        assert result.exit_code != 0
+        assert "Invalid value for '--limit'" in result.output
+    
+    def test_changes_command_rejects_non_positive_interval(self, runner):
+        """Test that --follow can't poll in a tight loop or with a negative sleep."""
+        for interval in ("0", "-1"):
+            result = runner.invoke(main, ['changes', '--follow', '--interval', interval])
+            
+            assert result.exit_code != 0
+            assert "Invalid value for '--interval'" in result.output
+    
+    def test_tui_command_rejects_zero_days(self, runner):
+        """Test that the dashboard needs at least one day."""
+        result = runner.invoke(main, ['tui', '--days', '0'])
+        
+        assert result.exit_code != 0
+        assert "Invalid value for '--days'" in result.output
+    
+    def test_sync_command(self, runner, tmp_path):
+        """Test that the sync command reports rows copied each way."""
+        first, second = tmp_path / "a.db", tmp_path / "b.db"
+        first.touch()
+        second.touch()
+        with patch('habit.cli.HabitDatabase') as mock_db_class:
+            mock_db = MagicMock()
+            mock_db.__enter__.return_value = mock_db
+            mock_db.sync_with.return_value = SyncResult(1, 2, 3, 4)
+            mock_db_class.return_value = mock_db
+            
+            result = runner.invoke(main, ['sync', str(first), str(second)])
+            
+            assert result.exit_code == 0
+            assert f"{first}: +1 habits, +2 entries" in result.output
+            assert f"{second}: +3 habits, +4 entries" in result.output
+            mock_db.sync_with.assert_called_once_with(second)
+    
+    def test_sync_command_not_a_database(self, runner, tmp_path):
+        """Test that syncing with a file that is not a database reports an error."""
+        first, second = tmp_path / "a.db", tmp_path / "b.db"
+        first.touch()
+        second.write_bytes(b"not a database" * 100)
+        
+        result = runner.invoke(main, ['sync', str(first), str(second)])
+        
+        assert result.exit_code == 0
+        assert "❌ Error: file is not a database" in result.output
+    
+    def test_correlate_command(self, runner):
+        """Test that the correlate command prints the strongest pairs."""
+        pytest.importorskip("numpy")
+        with patch('habit.cli.HabitDatabase'), patch('habit.analysis.correlate') as mock_correlate:
+            mock_correlate.return_value = [HabitPair("Read", "Run", 1, 12, 0.5)]
+            
+            result = runner.invoke(main, ['correlate', '--days', '30', '--lag', '1', '--top', '5'])
+            
+            assert result.exit_code == 0
+            assert "Read → (+1d) Run: φ=+0.50 (12 days)" in result.output
+            assert mock_correlate.call_args.kwargs == {"lag": 1, "top": 5, "min_together": 1}
+    
+    def test_snapshot_command(self, runner, tmp_path):
+        """Test that the snapshot command reports what was written."""
+        pytest.importorskip("numpy")
+        with patch('habit.cli.HabitDatabase'), patch('habit.snapshot.write_snapshot') as mock_write:
+            mock_write.return_value = SnapshotResult(3, date(2024, 1, 1), date(2024, 1, 31), 8, False)
+            
+            result = runner.invoke(main, ['snapshot', str(tmp_path / "snap"), '--format', 'npy'])
+            
+            assert result.exit_code == 0
+            assert "Updated (8 days written)" in result.output
+            assert "3 habits × 31 days" in result.output
     
     def test_version_option(self, runner):
         """Test that version option works."""
@@ -1,12 +1,15 @@
 """Unit tests for the database module."""
 
+import sqlite3
+import threading
+
 import pytest
 from datetime import date, datetime, timedelta
 from pathlib import Path
 from unittest.mock import patch
 
 from habit.db import HabitDatabase
-from habit.models import Habit, Entry
+from habit.models import ALL_WEEKDAYS, Habit, Entry, SyncResult
 
 
 class TestHabitDatabase:
@@ -111,6 +114,32 @@ class TestHabitDatabase:
         with pytest.raises(ValueError, match="Habit 'Nonexistent' not found"):
             db.mark_habit_done("Nonexistent")
     
+    def test_log_amount_accumulates(self, db):
+        """Test that amounts logged the same day add up in one entry."""
+        db.init_database()
+        db.add_habit("Water")
+        
+        first = db.log_amount("Water", 2)
+        second = db.log_amount("Water", 1.5)
+        done = db.mark_habit_done("Water")
+        
+        assert first.id == second.id == done.id
+        assert (first.value, second.value, done.value) == (2.0, 3.5, 3.5)
+        assert db.list_habits()[0].completed_today is True
+        changes = db.changes_since(0)
+        assert [c.op for c in changes] == ["habit_added", "entry_added", "entry_updated"]
+        assert [c.value for c in changes] == [None, 2.0, 3.5]
+    
+    def test_log_amount_invalid_raises_error(self, db):
+        """Test that non-positive amounts and unknown habits raise ValueError."""
+        db.init_database()
+        db.add_habit("Water")
+        
+        with pytest.raises(ValueError, match="Amount must be positive"):
+            db.log_amount("Water", 0)
+        with pytest.raises(ValueError, match="Habit 'Nonexistent' not found"):
+            db.log_amount("Nonexistent", 1)
+    
     def test_list_habits_empty(self, db):
         """Test listing habits when none exist."""
         db.init_database()
@@ -135,8 +164,8 @@ class TestHabitDatabase:
         assert habits[1].name == "Habit 2"
         assert habits[1].completed_today is False
     
-    def test_list_habits_show_all(self, db):
-        """Test listing habits with show_all=True."""
+    def test_list_habits_show_all_is_deprecated(self, db):
+        """Test that show_all=True warns and lists habits as usual."""
         db.init_database()
         habit1 = db.add_habit("Habit 1")
         habit2 = db.add_habit("Habit 2")
@@ -144,7 +173,8 @@ class TestHabitDatabase:
         # Mark one habit as done
         db.mark_habit_done("Habit 1")
         
-        habits = db.list_habits(show_all=True)
+        with pytest.warns(DeprecationWarning):
+            habits = db.list_habits(show_all=True)
         
         assert len(habits) == 2
         assert habits[0].name == "Habit 1"
@@ -157,7 +187,8 @@ class TestHabitDatabase:
         db.init_database()
         stats = db.get_stats(7)
         
-        assert stats == []
+        assert stats.windows == [7]
+        assert stats.rows == []
     
     def test_get_stats_with_data(self, db):
         """Test getting stats with habit data."""
@@ -169,9 +200,9 @@ class TestHabitDatabase:
         
         stats = db.get_stats(1)
         
-        assert len(stats) == 1
-        assert stats[0][0] == "Test Habit"
-        assert stats[0][1] == 100.0  # 100% completion for 1 day
+        assert len(stats.rows) == 1
+        assert stats.rows[0].name == "Test Habit"
+        assert stats.rows[0].rates == [100.0]  # 100% completion for 1 day
     
     def test_get_stats_multiple_days(self, db):
         """Test getting stats over multiple days."""
@@ -183,10 +214,836 @@ class TestHabitDatabase:
         
         stats = db.get_stats(7)
         
-        assert len(stats) == 1
-        assert stats[0][0] == "Test Habit"
+        assert len(stats.rows) == 1
+        assert stats.rows[0].name == "Test Habit"
         # Should be 1/7 = 14.29% completion
-        assert abs(stats[0][1] - 14.29) < 0.1
+        assert abs(stats.rows[0].rates[0] - 14.29) < 0.1
+    
+    def test_get_stats_multiple_windows(self, db):
+        """Test computing several windows and breakdowns in one call."""
+        db.init_database()
+        habit = db.add_habit("Test Habit")
+        db.add_habit("Idle Habit")
+        conn = db._get_connection()
+        today = date.today()
+        for offset in (0, 10, 40):
+            conn.execute(
+                "INSERT INTO entries (habit_id, entry_date) VALUES (?, ?)",
+                (habit.id, today - timedelta(days=offset))
+            )
+        conn.commit()
+        
+        stats = db.get_stats([7, 30, 90])
+        
+        assert stats.windows == [7, 30, 90]
+        assert [row.name for row in stats.rows] == ["Idle Habit", "Test Habit"]
+        assert stats.rows[0].rates == [0.0, 0.0, 0.0]
+        row = stats.rows[1]
+        assert row.rates == pytest.approx([100 / 7, 100 * 2 / 30, 100 * 3 / 90])
+        assert sum(row.weekdays) == 3
+        assert row.weekdays[today.weekday()] >= 1
+        assert len(row.months) == len(stats.months)
+        assert sum(row.months) == 3
+        assert stats.months[-1] == today.strftime("%Y-%m")
+    
+    def test_get_stats_invalid_window_raises_error(self, db):
+        """Test that non-positive windows raise ValueError."""
+        db.init_database()
+        
+        with pytest.raises(ValueError, match="Stats windows must be positive"):
+            db.get_stats([7, 0])
+        with pytest.raises(ValueError, match="At least one stats window is required"):
+            next(db.iter_stats([]))
+    
+    def test_add_habit_with_schedule(self, db):
+        """Test that a habit's schedule is stored and read back."""
+        db.init_database()
+        db.add_habit("Gym", weekdays=0b0010101, weekly_target=2)
+        
+        habit = db.get_habit_by_name("Gym")
+        assert (habit.weekdays, habit.weekly_target) == (0b0010101, 2)
+        listed = next(db.iter_habits())
+        assert (listed.weekdays, listed.weekly_target) == (0b0010101, 2)
+    
+    def test_add_habit_invalid_schedule_raises_error(self, db):
+        """Test that a weekly target above the due weekdays raises ValueError."""
+        db.init_database()
+        
+        with pytest.raises(ValueError, match="Weekly target must be between"):
+            db.add_habit("Gym", weekdays=0b0000011, weekly_target=3)
+        assert db.get_habit_by_name("Gym") is None
+    
+    def test_set_schedule(self, db):
+        """Test changing and resetting a habit's schedule."""
+        db.init_database()
+        db.add_habit("Gym")
+        
+        habit = db.set_schedule("Gym", weekly_target=3)
+        assert (habit.weekdays, habit.weekly_target) == (ALL_WEEKDAYS, 3)
+        habit = db.set_schedule("Gym")
+        assert (habit.weekdays, habit.weekly_target) == (ALL_WEEKDAYS, None)
+        with pytest.raises(ValueError, match="Habit 'Nonexistent' not found"):
+            db.set_schedule("Nonexistent")
+    
+    def test_get_stats_weekday_schedule(self, db):
+        """Test that only due weekdays are expected and counted."""
+        db.init_database()
+        # Due on Mon, Wed and Fri; done every day for two weeks
+        habit = db.add_habit("Gym", weekdays=0b0010101)
+        conn = db._get_connection()
+        today = date.today()
+        conn.executemany(
+            "INSERT INTO entries (habit_id, entry_date) VALUES (?, ?)",
+            [(habit.id, today - timedelta(days=offset)) for offset in range(14)]
+        )
+        conn.commit()
+        
+        row = db.get_stats([7, 14, 28]).rows[0]
+        
+        assert row.expected == [3.0, 6.0, 12.0]
+        assert row.actual == [3, 6, 6]
+        assert row.rates == [100.0, 100.0, 50.0]
+        assert sum(row.weekdays) == 14
+    
+    def test_get_stats_weekly_target(self, db):
+        """Test that a weekly target caps each week and is prorated."""
+        db.init_database()
+        habit = db.add_habit("Run", weekly_target=2)
+        conn = db._get_connection()
+        today = date.today()
+        # Five runs in the last 7 days, one in the 7 days before
+        conn.executemany(
+            "INSERT INTO entries (habit_id, entry_date) VALUES (?, ?)",
+            [(habit.id, today - timedelta(days=offset)) for offset in (0, 1, 2, 3, 4, 10)]
+        )
+        conn.commit()
+        
+        row = db.get_stats([7, 14, 21, 1]).rows[0]
+        
+        assert row.actual == [2, 3, 3, 1]
+        assert row.expected == pytest.approx([2.0, 4.0, 6.0, 2 / 7])
+        assert row.rates == pytest.approx([100.0, 75.0, 50.0, 100.0])
+    
+    def test_get_stats_nothing_due(self, db):
+        """Test that a window with no due day counts as fully done."""
+        db.init_database()
+        tomorrow = (date.today() + timedelta(days=1)).weekday()
+        db.add_habit("Weekly review", weekdays=1 << tomorrow)
+        
+        row = db.get_stats(1).rows[0]
+        
+        assert (row.actual, row.expected, row.rates) == ([0], [0.0], [100.0])
+    
+    def test_iter_habits_keyset_pagination(self, db):
+        """Test that iter_habits pages by name across PAGE_SIZE boundaries."""
+        db.init_database()
+        for i in range(7):
+            db.add_habit(f"Habit {i}")
+        
+        with patch('habit.db.PAGE_SIZE', 2):
+            names = [h.name for h in db.iter_habits()]
+            after = [h.name for h in db.iter_habits(after="Habit 2", limit=3)]
+        
+        assert names == [f"Habit {i}" for i in range(7)]
+        assert after == ["Habit 3", "Habit 4", "Habit 5"]
+    
+    def test_iter_entries_date_range(self, db):
+        """Test iterating a habit's entries within a date range."""
+        db.init_database()
+        habit = db.add_habit("Test Habit")
+        conn = db._get_connection()
+        today = date.today()
+        for offset in range(5):
+            conn.execute(
+                "INSERT INTO entries (habit_id, entry_date) VALUES (?, ?)",
+                (habit.id, today - timedelta(days=offset))
+            )
+        conn.commit()
+        
+        with patch('habit.db.PAGE_SIZE', 2):
+            dates = [e.entry_date for e in db.iter_entries(
+                "Test Habit", today - timedelta(days=3), today - timedelta(days=1)
+            )]
+        
+        assert dates == [today - timedelta(days=d) for d in (3, 2, 1)]
+    
+    def test_iter_entries_nonexistent_raises_error(self, db):
+        """Test that iterating entries of a nonexistent habit raises ValueError."""
+        db.init_database()
+        
+        with pytest.raises(ValueError, match="Habit 'Nonexistent' not found"):
+            list(db.iter_entries("Nonexistent"))
+    
+    def test_iter_stats_keyset_pagination(self, db):
+        """Test that iter_stats pages by name and honours after/limit."""
+        db.init_database()
+        for i in range(5):
+            db.add_habit(f"Habit {i}")
+        db.mark_habit_done("Habit 3")
+        
+        with patch('habit.db.PAGE_SIZE', 2):
+            stats = list(db.iter_stats(1, after="Habit 1", limit=3))
+        
+        assert [(row.name, row.rates) for row in stats] == [
+            ("Habit 2", [0.0]), ("Habit 3", [100.0]), ("Habit 4", [0.0])
+        ]
+    
+    def test_calendar_rate_uses_prefix_sums(self, db):
+        """Test calendar_rate over many habit/date-range pairs."""
+        db.init_database()
+        habit1 = db.add_habit("Habit 1")
+        habit2 = db.add_habit("Habit 2")
+        conn = db._get_connection()
+        today = date.today()
+        for offset in (1, 2, 5):
+            conn.execute(
+                "INSERT INTO entries (habit_id, entry_date) VALUES (?, ?)",
+                (habit1.id, today - timedelta(days=offset))
+            )
+        conn.commit()
+        db.rebuild_entry_counts()
+        db.mark_habit_done("Habit 1")
+        db.mark_habit_done("Habit 2")
+        
+        rates = db.calendar_rate(
+            [habit1.id, habit1.id, habit1.id, habit2.id],
+            [today - timedelta(days=5), today - timedelta(days=2), today - timedelta(days=4), today],
+            [today, today - timedelta(days=1), today - timedelta(days=3), today],
+        )
+        
+        assert rates == pytest.approx([400 / 6, 100.0, 0.0, 100.0])
+    
+    def test_entry_counts_append_out_of_order(self, db):
+        """Test that the prefix-sum index tracks entries inserted out of order."""
+        db.init_database()
+        habit = db.add_habit("Test Habit")
+        db.mark_habit_done("Test Habit")
+        db._append_entry_count(habit.id, date.today() - timedelta(days=3))
+        
+        rows = db._get_connection().execute(
+            "SELECT cumulative FROM entry_counts WHERE habit_id = ? ORDER BY entry_date",
+            (habit.id,)
+        ).fetchall()
+        
+        assert [row["cumulative"] for row in rows] == [1, 2]
+    
+    def test_init_database_backfills_entry_counts(self, db):
+        """Test that init_database rebuilds a stale prefix-sum index."""
+        db.init_database()
+        habit = db.add_habit("Test Habit")
+        conn = db._get_connection()
+        conn.execute(
+            "INSERT INTO entries (habit_id, entry_date) VALUES (?, ?)",
+            (habit.id, date.today())
+        )
+        conn.commit()
+        
+        db.init_database()
+        
+        assert db.calendar_rate([habit.id], date.today(), date.today()) == [100.0]
+    
+    def test_value_stats_from_aggregates(self, db):
+        """Test totals and averages of logged amounts over date ranges."""
+        db.init_database()
+        water = db.add_habit("Water")
+        idle = db.add_habit("Idle")
+        conn = db._get_connection()
+        today = date.today()
+        conn.executemany(
+            "INSERT INTO entries (habit_id, entry_date, value) VALUES (?, ?, ?)",
+            [(water.id, today - timedelta(days=offset), value)
+             for offset, value in [(1, 4), (2, 8), (3, 6), (4, 6), (10, 2)]]
+        )
+        conn.commit()
+        db.rebuild_entry_counts()
+        db.log_amount("Water", 3)
+        db.log_amount("Water", 3)
+        
+        week, everything, none = db.value_stats(
+            [water.id, water.id, idle.id],
+            [today - timedelta(days=6), today - timedelta(days=30), today],
+            today,
+        )
+        
+        assert (week.total, week.days, week.average) == (30.0, 5, 6.0)
+        assert (everything.total, everything.days) == (32.0, 6)
+        assert (none.total, none.days, none.average) == (0.0, 0, None)
+    
+    def test_value_percentiles_cover_all_logged_days(self, db):
+        """Test nearest-rank percentiles from the entry_values histogram."""
+        db.init_database()
+        water = db.add_habit("Water")
+        idle = db.add_habit("Idle")
+        conn = db._get_connection()
+        today = date.today()
+        conn.executemany(
+            "INSERT INTO entries (habit_id, entry_date, value) VALUES (?, ?, ?)",
+            [(water.id, today - timedelta(days=offset), value)
+             for offset, value in [(1, 4), (2, 8), (3, 6), (4, 6), (400, 2)]]
+        )
+        conn.commit()
+        db.rebuild_entry_counts()
+        
+        assert db.value_percentiles([water.id, idle.id], percentiles=(1, 50, 90, 100)) == [
+            {1: 2.0, 50: 6.0, 90: 8.0, 100: 8.0},
+            {},
+        ]
+    
+    def test_value_aggregates_match_rebuild(self, db):
+        """Test that incrementally maintained aggregates equal a full rebuild."""
+        db.init_database()
+        habit = db.add_habit("Water")
+        db.log_amount("Water", 2)
+        # Backfill a past day between the logs
+        with db._write_transaction() as conn:
+            conn.execute(
+                "INSERT INTO entries (habit_id, entry_date, value) VALUES (?, ?, 5)",
+                (habit.id, date.today() - timedelta(days=3))
+            )
+            db._append_entry_count(habit.id, date.today() - timedelta(days=3), 5.0)
+        db.log_amount("Water", 3)
+        db.log_amount("Water", 1)
+        conn = db._get_connection()
+        
+        def aggregates():
+            return (
+                [tuple(row) for row in conn.execute("SELECT * FROM entry_counts ORDER BY entry_date")],
+                [tuple(row) for row in conn.execute("SELECT * FROM entry_values ORDER BY value")],
+            )
+        
+        maintained = aggregates()
+        db.rebuild_entry_counts()
+        
+        assert maintained == aggregates()
+        assert maintained[1] == [(habit.id, 5.0, 1), (habit.id, 6.0, 1)]
+    
+    def test_value_percentiles_invalid_percentile_raises_error(self, db):
+        """Test that percentiles outside 1-100 raise ValueError."""
+        db.init_database()
+        
+        with pytest.raises(ValueError, match="Percentiles must be between 1 and 100"):
+            db.value_percentiles([1], percentiles=(0,))
+    
+    def test_init_database_rebuilds_entry_counts_without_values(self, db):
+        """Test that a prefix-sum index from before quantities is rebuilt."""
+        db.init_database()
+        db.add_habit("Water")
+        db.log_amount("Water", 4)
+        conn = db._get_connection()
+        conn.execute("DROP TABLE entry_counts")
+        conn.execute("""
+            CREATE TABLE entry_counts (
+                habit_id INTEGER NOT NULL,
+                entry_date DATE NOT NULL,
+                cumulative INTEGER NOT NULL,
+                PRIMARY KEY (habit_id, entry_date)
+            ) WITHOUT ROWID
+        """)
+        conn.commit()
+        
+        db.init_database()
+        
+        stats = db.value_stats([1], date.today(), date.today())[0]
+        assert (stats.total, stats.days) == (4.0, 1)
+    
+    def test_calendar_rate_ignores_schedule(self, db):
+        """Test that calendar_rate counts calendar days while stats follow the schedule."""
+        db.init_database()
+        habit = db.add_habit("Gym", weekdays=0b0010101)
+        today = date.today()
+        due_days = [today - timedelta(days=offset) for offset in range(14)
+                    if (today - timedelta(days=offset)).weekday() in (0, 2, 4)]
+        conn = db._get_connection()
+        conn.executemany(
+            "INSERT INTO entries (habit_id, entry_date) VALUES (?, ?)",
+            [(habit.id, day) for day in due_days]
+        )
+        conn.commit()
+        db.rebuild_entry_counts()
+        
+        assert db.get_stats(14).rows[0].rates == [100.0]
+        assert db.calendar_rate([habit.id], today - timedelta(days=13), today) == [
+            pytest.approx(len(due_days) / 14 * 100)
+        ]
+    
+    def test_calendar_rate_invalid_range_raises_error(self, db):
+        """Test that a range ending before it starts raises ValueError."""
+        db.init_database()
+        today = date.today()
+        
+        with pytest.raises(ValueError, match="Range end must not be before its start"):
+            db.calendar_rate([1], today, today - timedelta(days=1))
+    
+    def test_remove_habits_deletes_history_in_chunks(self, db):
+        """Test removing habits by name and glob, including their entries."""
+        db.init_database()
+        habit = db.add_habit("Read")
+        db.add_habit("Read aloud")
+        db.add_habit("Run")
+        conn = db._get_connection()
+        conn.executemany(
+            "INSERT INTO entries (habit_id, entry_date) VALUES (?, ?)",
+            [(habit.id, date.today() - timedelta(days=offset)) for offset in range(2500)]
+        )
+        conn.commit()
+        db.rebuild_entry_counts()
+        
+        transactions = db.lock_stats.transactions
+        with patch('habit.db.DELETE_CHUNK_SIZE', 1000):
+            removed = db.remove_habits(["Run"], pattern="Read*", vacuum=True)
+        
+        assert removed == ["Read", "Read aloud", "Run"]
+        # Read: three chunks, one finding nothing left, one removing the
+        # habit; Read aloud and Run: one empty chunk and one removal each
+        assert db.lock_stats.transactions - transactions == 9
+        assert db.list_habits() == []
+        assert conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0] == 0
+        assert conn.execute("SELECT COUNT(*) FROM entry_counts").fetchone()[0] == 0
+        assert conn.execute("SELECT COUNT(*) FROM entry_values").fetchone()[0] == 0
+        # Every freed page went back to the file system
+        assert conn.execute("PRAGMA freelist_count").fetchone()[0] == 0
+    
+    def test_interrupted_remove_leaves_consistent_aggregates(self, db):
+        """Test that each committed chunk keeps prefix sums and histogram in step."""
+        db.init_database()
+        habit = db.add_habit("Water")
+        conn = db._get_connection()
+        conn.executemany(
+            "INSERT INTO entries (habit_id, entry_date, value) VALUES (?, ?, ?)",
+            [(habit.id, date.today() - timedelta(days=offset), offset % 3 + 1)
+             for offset in range(5)]
+        )
+        conn.commit()
+        db.rebuild_entry_counts()
+        
+        write_transaction = db._write_transaction
+        calls = []
+        
+        def flaky_write_transaction():
+            calls.append(None)
+            if len(calls) == 2:
+                raise sqlite3.OperationalError("database is locked")
+            return write_transaction()
+        
+        with patch.object(db, '_write_transaction', flaky_write_transaction), \
+                patch('habit.db.DELETE_CHUNK_SIZE', 2):
+            with pytest.raises(sqlite3.OperationalError, match="locked"):
+                db.remove_habits(["Water"])
+        
+        def aggregates():
+            return (
+                [tuple(row) for row in conn.execute("SELECT * FROM entry_counts ORDER BY entry_date")],
+                [tuple(row) for row in conn.execute("SELECT * FROM entry_values ORDER BY value")],
+            )
+        
+        assert conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0] == 3
+        start = date.today() - timedelta(days=4)
+        assert db.calendar_rate([habit.id], start, date.today()) == [60.0]
+        assert db.get_stats(5).rows[0].actual == [3]
+        left = aggregates()
+        db.rebuild_entry_counts()
+        assert left == aggregates()
+    
+    def test_remove_habits_nonexistent_raises_error(self, db):
+        """Test that an unknown name aborts removal before deleting anything."""
+        db.init_database()
+        db.add_habit("Read")
+        
+        with pytest.raises(ValueError, match="Habit 'Nonexistent' not found"):
+            db.remove_habits(["Read", "Nonexistent"])
+        
+        assert db.get_habit_by_name("Read") is not None
+    
+    def test_deleting_habit_cascades_to_entries(self, db):
+        """Test that entries are deleted with their habit via the foreign key."""
+        db.init_database()
+        habit = db.add_habit("Read")
+        db.mark_habit_done("Read")
+        conn = db._get_connection()
+        
+        conn.execute("DELETE FROM habits WHERE id = ?", (habit.id,))
+        conn.commit()
+        
+        assert conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0] == 0
+    
+    def test_init_database_migrates_entries_to_cascade(self, db):
+        """Test that an old entries table is rebuilt with ON DELETE CASCADE."""
+        conn = db._get_connection()
+        conn.execute("""
+            CREATE TABLE habits (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT UNIQUE NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE entries (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                habit_id INTEGER NOT NULL,
+                entry_date DATE NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (habit_id) REFERENCES habits (id),
+                UNIQUE(habit_id, entry_date)
+            )
+        """)
+        conn.execute("INSERT INTO habits (name) VALUES ('Read')")
+        conn.execute("INSERT INTO entries (habit_id, entry_date) VALUES (1, ?)", (date.today(),))
+        conn.commit()
+        
+        db.init_database()
+        
+        foreign_keys = conn.execute("PRAGMA foreign_key_list(entries)").fetchall()
+        assert [fk["on_delete"] for fk in foreign_keys] == ["CASCADE"]
+        assert db.list_habits()[0].completed_today is True
+        assert db.list_habits()[0].weekdays == ALL_WEEKDAYS
+        assert [e.value for e in db.iter_entries("Read")] == [1.0]
+        assert db.value_stats([1], date.today(), date.today())[0].total == 1.0
+    
+    def test_old_schema_asks_for_init(self, db):
+        """Test that a habits table from before schedules asks for 'habit init'."""
+        conn = db._get_connection()
+        conn.execute("""
+            CREATE TABLE habits (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT UNIQUE NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        conn.execute("INSERT INTO habits (name) VALUES ('Read')")
+        conn.commit()
+        
+        with pytest.raises(ValueError, match="run 'habit init'"):
+            db.get_habit_by_name("Read")
+        
+        db.init_database()
+        assert db.get_habit_by_name("Read").weekdays == ALL_WEEKDAYS
+    
+    def test_resolve_habit_exact_prefix_and_typo(self, db):
+        """Test resolving habits by exact name, unique prefix and misspelling."""
+        db.init_database()
+        db.add_habit("Morning meditation")
+        db.add_habit("Read before bed")
+        db.add_habit("Read news")
+        
+        assert db.resolve_habit("Read news").name == "Read news"
+        assert db.resolve_habit("Morn").name == "Morning meditation"
+        assert db.resolve_habit("mornign meditaton").name == "Morning meditation"
+        assert db.resolve_habit("mornign").name == "Morning meditation"
+        assert db.resolve_habit("Read befor bed").name == "Read before bed"
+    
+    def test_resolve_habit_typo_among_many_similar_names(self, db):
+        """Test that typos resolve when most trigrams are shared by many habits."""
+        db.init_database()
+        for number in range(300):
+            db.add_habit(f"habit {number:05d}")
+        db.add_habit("Morning meditation")
+        
+        with patch('habit.db.FUZZY_COMMON_TRIGRAM', 50):
+            assert db.resolve_habit("habti 00212").name == "habit 00212"
+            assert db.resolve_habit("mornign meditaton").name == "Morning meditation"
+    
+    def test_resolve_habit_without_fuzzy_matching(self, db):
+        """Test that fuzzy=False still resolves prefixes but not misspellings."""
+        db.init_database()
+        db.add_habit("Morning meditation")
+        
+        assert db.resolve_habit("Morn", fuzzy=False).name == "Morning meditation"
+        with pytest.raises(ValueError, match="Habit 'mornign' not found"):
+            db.resolve_habit("mornign", fuzzy=False)
+    
+    def test_resolve_habit_ambiguous_or_missing_raises_error(self, db):
+        """Test that ambiguous prefixes and unknown names raise ValueError."""
+        db.init_database()
+        db.add_habit("Read before bed")
+        db.add_habit("Read news")
+        
+        with pytest.raises(ValueError, match="Habit 'Read' is ambiguous: Read before bed, Read news"):
+            db.resolve_habit("Read")
+        with pytest.raises(ValueError, match="Habit 'Swim' not found"):
+            db.resolve_habit("Swim")
+    
+    def test_complete_habit_names(self, db):
+        """Test prefix completion of habit names."""
+        db.init_database()
+        for name in ("Read", "Read news", "Run", "Swim"):
+            db.add_habit(name)
+        
+        assert db.complete_habit_names("R") == ["Read", "Read news", "Run"]
+        assert db.complete_habit_names("Rea", limit=1) == ["Read"]
+        assert db.complete_habit_names("X") == []
+    
+    def test_name_trigrams_follow_habit_removal(self, db):
+        """Test that removed habits drop out of the trigram index."""
+        db.init_database()
+        db.add_habit("Read")
+        db.remove_habits(["Read"])
+        conn = db._get_connection()
+        
+        assert conn.execute("SELECT COUNT(*) FROM name_trigrams").fetchone()[0] == 0
+    
+    def test_changes_since_records_writes_in_order(self, db):
+        """Test that adds, completions and removals are logged with cursors."""
+        db.init_database()
+        habit = db.add_habit("Read")
+        db.mark_habit_done("Read")
+        db.mark_habit_done("Read")  # Idempotent: not logged twice
+        db.remove_habits(["Read"])
+        
+        changes = db.changes_since(0)
+        
+        assert [c.op for c in changes] == ["habit_added", "entry_added", "habit_removed"]
+        assert all(c.habit_id == habit.id and c.habit_name == "Read" for c in changes)
+        assert changes[1].entry_date == date.today()
+        assert [c.seq for c in changes] == sorted(c.seq for c in changes)
+        assert [c.op for c in db.changes_since(changes[0].seq, limit=1)] == ["entry_added"]
+        assert db.changes_since(changes[-1].seq) == []
+    
+    def test_entry_watermark_queries(self, db):
+        """Test the helpers used to follow new habits and entries."""
+        db.init_database()
+        assert db.habit_signature() == (0, 0, 0)
+        assert db.last_entry_id() == 0
+        read = db.add_habit("Read")
+        run = db.add_habit("Run")
+        db.mark_habit_done("Read")
+        watermark = db.last_entry_id()
+        db.mark_habit_done("Run")
+        
+        signature = db.habit_signature()
+        assert signature[:2] == (run.id, 2)
+        db.set_schedule("Run", 0b0010101, None)
+        assert db.habit_signature() != signature
+        
+        # Changes that a checksum over every schedule could cancel out
+        db.set_schedule("Run", 0b0000001)
+        signature = db.habit_signature()
+        db.set_schedule("Read", 0b1111101)
+        db.set_schedule("Run", 0b0000010)
+        assert db.habit_signature() != signature
+        assert [e.habit_id for e in db.entries_since(0)] == [read.id, run.id]
+        assert [e.habit_id for e in db.entries_since(watermark)] == [run.id]
+        yesterday = date.today() - timedelta(days=1)
+        assert sorted(db.completion_offsets(yesterday, date.today())) == [(read.id, 1), (run.id, 1)]
+        assert db.completion_offsets(yesterday, date.today(), habit_ids=[run.id]) == [(run.id, 1)]
+    
+    def test_summarize_changes_since(self, db):
+        """Test the change-log summary and related snapshot helpers."""
+        db.init_database()
+        assert db.last_change_seq() == 0
+        assert db.first_entry_date() is None
+        assert len(db.database_id()) == 32
+        db.add_habit("Read")
+        cursor = db.last_change_seq()
+        db.mark_habit_done("Read")
+        
+        assert db.summarize_changes_since(0) == (True, date.today())
+        assert db.summarize_changes_since(cursor) == (False, date.today())
+        assert db.summarize_changes_since(db.last_change_seq()) == (False, None)
+        assert db.first_entry_date() == date.today()
+        
+        cursor = db.last_change_seq()
+        db.log_amount("Read", 2)
+        assert db.summarize_changes_since(cursor) == (False, None)
+    
+    def test_init_database_seeds_change_log(self, db):
+        """Test that existing rows are logged when the change log is created."""
+        db.init_database()
+        db.add_habit("Read")
+        db.mark_habit_done("Read")
+        conn = db._get_connection()
+        conn.execute("DROP TABLE changes")
+        conn.commit()
+        
+        db.init_database()
+        
+        assert [c.op for c in db.changes_since(0)] == ["habit_added", "entry_added"]
+    
+    def test_sync_with_merges_both_ways(self, db, tmp_path):
+        """Test that sync reconciles habits by name and copies entries both ways."""
+        db.init_database()
+        db.add_habit("Read")
+        db.add_habit("Run")
+        db.mark_habit_done("Run")
+        
+        peer_path = tmp_path / "peer.db"
+        with HabitDatabase(peer_path) as peer:
+            peer.init_database()
+            peer.add_habit("Swim", weekly_target=2)
+            peer.add_habit("Run")
+            peer.log_amount("Swim", 20)
+            peer.mark_habit_done("Run")
+        
+        result = db.sync_with(peer_path)
+        
+        assert (result.habits_pulled, result.entries_pulled) == (1, 1)
+        assert (result.habits_pushed, result.entries_pushed) == (1, 0)
+        with HabitDatabase(peer_path) as peer:
+            assert [h.name for h in peer.list_habits()] == ["Read", "Run", "Swim"]
+            assert [h.completed_today for h in peer.list_habits()] == [False, True, True]
+        assert [h.completed_today for h in db.list_habits()] == [False, True, True]
+        swim = db.get_habit_by_name("Swim")
+        assert swim.weekly_target == 2
+        assert db.value_stats([swim.id], date.today(), date.today())[0].total == 20.0
+        assert db.calendar_rate([swim.id], date.today(), date.today()) == [100.0]
+        assert db.resolve_habit("Swmi").name == "Swim"
+        assert [c.op for c in db.changes_since(0)][-2:] == ["habit_added", "entry_added"]
+    
+    def test_sync_with_only_copies_new_rows(self, db, tmp_path):
+        """Test that watermarks limit later syncs to rows added since."""
+        db.init_database()
+        db.add_habit("Read")
+        peer_path = tmp_path / "peer.db"
+        with HabitDatabase(peer_path) as peer:
+            peer.init_database()
+        db.sync_with(peer_path)
+        db.sync_with(peer_path)
+        
+        with HabitDatabase(peer_path) as peer:
+            peer.mark_habit_done("Read")
+        result = db.sync_with(peer_path)
+        
+        assert (result.habits_pulled, result.entries_pulled) == (0, 1)
+        assert (result.habits_pushed, result.entries_pushed) == (0, 0)
+        watermark = db._get_connection().execute(
+            "SELECT entry_watermark FROM sync_state"
+        ).fetchone()[0]
+        assert watermark == 1
+    
+    def test_sync_with_propagates_updated_amounts(self, db, tmp_path):
+        """Test that amounts added to synced entries reach the other side."""
+        db.init_database()
+        db.add_habit("Gym")
+        db.log_amount("Gym", 3)
+        peer_path = tmp_path / "peer.db"
+        with HabitDatabase(peer_path) as peer:
+            peer.init_database()
+        db.sync_with(peer_path)
+        
+        db.log_amount("Gym", 5)
+        with HabitDatabase(peer_path) as peer:
+            peer.log_amount("Gym", 1)
+        result = db.sync_with(peer_path)
+        
+        # The larger total wins on both sides
+        assert (result.habits_pulled, result.entries_pulled) == (0, 0)
+        assert (result.habits_pushed, result.entries_pushed) == (0, 1)
+        today = date.today()
+        for path in (db.db_path, peer_path):
+            with HabitDatabase(path) as side:
+                gym = side.get_habit_by_name("Gym")
+                assert [e.value for e in side.iter_entries("Gym")] == [8.0]
+                assert side.value_stats([gym.id], today, today)[0].total == 8.0
+                assert side.value_percentiles([gym.id], [50]) == [{50: 8.0}]
+        with HabitDatabase(peer_path) as peer:
+            last = peer.changes_since(peer.last_change_seq() - 1)
+            assert [(c.op, c.value) for c in last] == [("entry_updated", 8.0)]
+        
+        result = db.sync_with(peer_path)
+        assert result == SyncResult(0, 0, 0, 0)
+        
+        with HabitDatabase(peer_path) as peer:
+            peer.log_amount("Gym", 4)
+        result = db.sync_with(peer_path)
+        assert (result.entries_pulled, result.entries_pushed) == (1, 0)
+        gym = db.get_habit_by_name("Gym")
+        assert db.value_stats([gym.id], today, today)[0].total == 12.0
+    
+    def test_sync_with_recreates_habit_removed_locally(self, db, tmp_path):
+        """Test that new peer entries for a locally removed habit are kept."""
+        db.init_database()
+        db.add_habit("Yoga")
+        peer_path = tmp_path / "peer.db"
+        with HabitDatabase(peer_path) as peer:
+            peer.init_database()
+        db.sync_with(peer_path)
+        
+        db.remove_habits(["Yoga"])
+        with HabitDatabase(peer_path) as peer:
+            peer.mark_habit_done("Yoga")
+        result = db.sync_with(peer_path)
+        
+        assert (result.habits_pulled, result.entries_pulled) == (1, 1)
+        assert (result.habits_pushed, result.entries_pushed) == (0, 0)
+        assert db.list_habits()[0].name == "Yoga"
+        assert db.list_habits()[0].completed_today is True
+    
+    def test_sync_with_copied_file(self, db, tmp_path):
+        """Test that a copied database gets its own identity on first sync."""
+        import shutil
+        
+        db.init_database()
+        db.add_habit("Read")
+        db.close()
+        copy_path = tmp_path / "copy.db"
+        shutil.copy(db.db_path, copy_path)
+        with HabitDatabase(copy_path) as copy:
+            copy.add_habit("Run")
+        
+        result = db.sync_with(copy_path)
+        
+        assert result.habits_pulled == 1
+        ids = {
+            HabitDatabase(path)._get_connection().execute(
+                "SELECT value FROM meta WHERE key = 'database_id'"
+            ).fetchone()[0]
+            for path in (db.db_path, copy_path)
+        }
+        assert len(ids) == 2
+    
+    def test_sync_with_missing_peer_raises_error(self, db, tmp_path):
+        """Test that syncing with a missing file raises ValueError."""
+        db.init_database()
+        
+        with pytest.raises(ValueError, match="not found"):
+            db.sync_with(tmp_path / "missing.db")
+        with pytest.raises(ValueError, match="Cannot sync a database with itself"):
+            db.sync_with(db.db_path)
+    
+    def test_write_retries_while_locked(self, db):
+        """Test that a write waits for another connection's lock and succeeds."""
+        db.init_database()
+        db.add_habit("Read")
+        other = sqlite3.connect(str(db.db_path), isolation_level=None, check_same_thread=False)
+        other.execute("BEGIN IMMEDIATE")
+        release = threading.Timer(0.2, other.execute, ("COMMIT",))
+        release.start()
+        
+        entry = db.mark_habit_done("Read")
+        release.join()
+        other.close()
+        
+        assert entry.entry_date == date.today()
+        assert db.lock_stats.retries > 0
+        assert db.lock_stats.max_wait_seconds >= 0.1
+        assert db.lock_stats.failures == 0
+    
+    def test_write_gives_up_after_lock_timeout(self, db):
+        """Test that a write raises once LOCK_TIMEOUT has passed."""
+        db.init_database()
+        db.add_habit("Read")
+        other = sqlite3.connect(str(db.db_path), isolation_level=None)
+        other.execute("BEGIN IMMEDIATE")
+        
+        with patch('habit.db.LOCK_TIMEOUT', 0.05):
+            with pytest.raises(sqlite3.OperationalError, match="locked"):
+                db.mark_habit_done("Read")
+        other.execute("COMMIT")
+        other.close()
+        
+        assert db.lock_stats.failures == 1
+        assert db.list_habits()[0].completed_today is False
+    
+    def test_write_transaction_rolls_back_on_error(self, db):
+        """Test that a failed write leaves no partial rows behind."""
+        db.init_database()
+        db.add_habit("Read")
+        
+        with pytest.raises(ValueError):
+            db.add_habit("Read")
+        
+        changes = db.changes_since(0)
+        assert [c.op for c in changes] == ["habit_added"]
+        assert db.lock_stats.transactions == 2
     
     def test_context_manager(self, db):
         """Test that HabitDatabase works as a context manager."""
@@ -3,7 +3,7 @@
 import pytest
 from datetime import date, datetime
 
-from habit.models import Habit, Entry
+from habit.models import Change, Habit, Entry, StatsTable
 
 
 class TestHabit:
@@ -49,6 +49,16 @@ class TestHabit:
         
         with pytest.raises(ValueError, match="Habit ID must be positive"):
             Habit(id=-1, name="Test Habit", created_at=now)
+    
+    def test_habit_validation_schedule(self):
+        """Test that schedules without weekdays or with bad targets raise ValueError."""
+        now = datetime.now()
+        
+        with pytest.raises(ValueError, match="at least one weekday"):
+            Habit(id=1, name="Test Habit", created_at=now, weekdays=0)
+        
+        with pytest.raises(ValueError, match="Weekly target must be between"):
+            Habit(id=1, name="Test Habit", created_at=now, weekdays=0b11, weekly_target=3)
 
 
 class TestEntry:
@@ -95,6 +105,13 @@ class TestEntry:
         with pytest.raises(ValueError, match="Entry date cannot be in the future"):
             Entry(id=1, habit_id=1, entry_date=tomorrow, created_at=now)
     
+    def test_entry_validation_non_positive_value(self):
+        """Test that a non-positive entry value raises ValueError."""
+        now = datetime.now()
+        
+        with pytest.raises(ValueError, match="Entry value must be positive"):
+            Entry(id=1, habit_id=1, entry_date=date.today(), created_at=now, value=0)
+    
     def test_entry_validation_today_date(self):
         """Test that today's date is valid."""
         now = datetime.now()
@@ -111,4 +128,50 @@ class TestEntry:
         
         # Should not raise any error
         entry = Entry(id=1, habit_id=1, entry_date=yesterday, created_at=now)
-        assert entry.entry_date == yesterday 
\ No newline at end of file
+        assert entry.entry_date == yesterday
+
+
+class TestChange:
+    """Test cases for Change model."""
+    
+    def test_change_creation(self):
+        """Test creating a valid change."""
+        now = datetime.now()
+        change = Change(seq=1, op="habit_added", habit_id=1, habit_name="Read",
+                        entry_date=None, created_at=now)
+        
+        assert change.seq == 1
+        assert change.entry_date is None
+    
+    def test_change_validation_invalid_seq(self):
+        """Test that non-positive sequence numbers raise ValueError."""
+        with pytest.raises(ValueError, match="Change sequence number must be positive"):
+            Change(seq=0, op="habit_added", habit_id=1, habit_name="Read",
+                   entry_date=None, created_at=datetime.now())
+    
+    def test_change_validation_unknown_op(self):
+        """Test that unknown operations raise ValueError."""
+        with pytest.raises(ValueError, match="Unknown change operation 'renamed'"):
+            Change(seq=1, op="renamed", habit_id=1, habit_name="Read",
+                   entry_date=None, created_at=datetime.now())
+
+
+class TestStatsTable:
+    """Test cases for StatsTable model."""
+    
+    def test_stats_table_creation(self):
+        """Test creating a valid stats table."""
+        table = StatsTable(windows=[7, 30], months=["2024-01"])
+        
+        assert table.windows == [7, 30]
+        assert table.rows == []
+    
+    def test_stats_table_validation_no_windows(self):
+        """Test that an empty window list raises ValueError."""
+        with pytest.raises(ValueError, match="At least one stats window is required"):
+            StatsTable(windows=[], months=[])
+    
+    def test_stats_table_validation_invalid_window(self):
+        """Test that non-positive windows raise ValueError."""
+        with pytest.raises(ValueError, match="Stats windows must be positive"):
+            StatsTable(windows=[7, -1], months=[])
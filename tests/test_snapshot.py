@@ -0,0 +1,133 @@
+"""Unit tests for the snapshot module."""
+
+from datetime import date, timedelta
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from habit.analysis import completion_matrix
+from habit.db import HabitDatabase
+from habit.snapshot import load_snapshot, write_snapshot
+
+
+class TestSnapshot:
+    """Test cases for columnar snapshots."""
+    
+    @pytest.fixture
+    def db(self, tmp_path):
+        """Create a database with three habits over fifty days."""
+        db = HabitDatabase(tmp_path / "test_habits.db")
+        db.init_database()
+        self.start = date(2024, 1, 1)
+        conn = db._get_connection()
+        for step, name in enumerate(["Read", "Run", "Swim"], start=2):
+            habit = db.add_habit(name)
+            conn.executemany(
+                "INSERT INTO entries (habit_id, entry_date) VALUES (?, ?)",
+                [(habit.id, self.start + timedelta(days=d)) for d in range(0, 50, step)]
+            )
+        conn.commit()
+        yield db
+        db.close()
+    
+    def unpacked(self, path):
+        """Load a snapshot and unpack its matrix to booleans."""
+        header, ids, names, done = load_snapshot(path)
+        return header, names.tolist(), np.unpackbits(done, axis=1, count=header["days"]).astype(bool)
+    
+    def test_snapshot_matches_database(self, db, tmp_path):
+        """Test that a snapshot holds the same matrix as the database."""
+        end = self.start + timedelta(days=29)
+        result = write_snapshot(db, tmp_path / "snap", end=end)
+        
+        header, names, matrix = self.unpacked(tmp_path / "snap")
+        assert result.rebuilt
+        assert (result.habits, result.start, result.days_written) == (3, self.start, 30)
+        assert names == ["Read", "Run", "Swim"]
+        assert (header["start"], header["days"]) == ("2024-01-01", 30)
+        assert (matrix == completion_matrix(db, self.start, end)[2]).all()
+    
+    def test_snapshot_is_memory_mapped(self, db, tmp_path):
+        """Test that every array loads as a read-only memory map."""
+        write_snapshot(db, tmp_path / "snap", end=self.start + timedelta(days=9))
+        
+        _, ids, names, done = load_snapshot(tmp_path / "snap")
+        for array in (ids, names, done):
+            assert isinstance(array, np.memmap)
+            assert not array.flags.writeable
+    
+    def test_snapshot_appends_new_days(self, db, tmp_path):
+        """Test that re-snapshotting only writes days from the last partial byte."""
+        write_snapshot(db, tmp_path / "snap", end=self.start + timedelta(days=19))
+        end = self.start + timedelta(days=44)
+        result = write_snapshot(db, tmp_path / "snap", end=end)
+        
+        _, _, matrix = self.unpacked(tmp_path / "snap")
+        assert not result.rebuilt
+        assert result.days_written == 45 - 16
+        assert (matrix == completion_matrix(db, self.start, end)[2]).all()
+    
+    def test_snapshot_rewrites_backdated_entries(self, db, tmp_path):
+        """Test that entries logged for past days are written into the snapshot."""
+        end = self.start + timedelta(days=39)
+        write_snapshot(db, tmp_path / "snap", end=end)
+        habit = db.get_habit_by_name("Swim")
+        with db._write_transaction() as conn:
+            conn.execute(
+                "INSERT INTO entries (habit_id, entry_date) VALUES (?, ?)",
+                (habit.id, self.start + timedelta(days=10))
+            )
+            db._log_change("entry_added", habit.id, habit.name, self.start + timedelta(days=10))
+        
+        result = write_snapshot(db, tmp_path / "snap", end=end)
+        
+        _, _, matrix = self.unpacked(tmp_path / "snap")
+        assert not result.rebuilt
+        assert result.days_written == 40 - 8
+        assert matrix[2, 10]
+        assert (matrix == completion_matrix(db, self.start, end)[2]).all()
+    
+    def test_snapshot_rebuilds_when_habits_change(self, db, tmp_path):
+        """Test that adding a habit rebuilds the snapshot with a new row."""
+        end = self.start + timedelta(days=9)
+        write_snapshot(db, tmp_path / "snap", end=end)
+        db.add_habit("Yoga")
+        
+        result = write_snapshot(db, tmp_path / "snap", end=end)
+        
+        _, names, matrix = self.unpacked(tmp_path / "snap")
+        assert result.rebuilt
+        assert names == ["Read", "Run", "Swim", "Yoga"]
+        assert matrix.shape == (4, 10)
+    
+    def test_snapshot_rebuild_keeps_existing_start(self, db, tmp_path):
+        """Test that a rebuild without a start day keeps the snapshot's start."""
+        start = self.start + timedelta(days=5)
+        end = self.start + timedelta(days=19)
+        write_snapshot(db, tmp_path / "snap", start=start, end=end)
+        db.add_habit("Yoga")
+        
+        result = write_snapshot(db, tmp_path / "snap", end=end)
+        
+        header, _, matrix = self.unpacked(tmp_path / "snap")
+        assert result.rebuilt
+        assert result.start == start
+        assert header["start"] == start.isoformat()
+        assert (matrix == completion_matrix(db, start, end)[2]).all()
+    
+    def test_snapshot_of_empty_database(self, tmp_path):
+        """Test that an empty database gives an empty snapshot."""
+        with HabitDatabase(tmp_path / "empty.db") as db:
+            db.init_database()
+            result = write_snapshot(db, tmp_path / "snap", end=date(2024, 1, 1))
+        
+        header, names, matrix = self.unpacked(tmp_path / "snap")
+        assert result.habits == 0
+        assert names == []
+        assert matrix.shape == (0, 1)
+    
+    def test_snapshot_start_after_end_raises_error(self, db, tmp_path):
+        """Test that a start day after the end day raises ValueError."""
+        with pytest.raises(ValueError, match="must not be after"):
+            write_snapshot(db, tmp_path / "snap", start=date(2024, 2, 1), end=date(2024, 1, 1))
@@ -0,0 +1,177 @@
+"""Unit tests for the TUI module."""
+
+from datetime import date, timedelta
+from unittest.mock import patch
+
+import pytest
+
+from habit.db import HabitDatabase
+from habit.tui import Dashboard, run
+
+
+class FakeScreen:
+    """Minimal stand-in for a curses window that records writes."""
+    
+    def __init__(self, height=10, width=60):
+        self.height = height
+        self.width = width
+        self.writes = []
+    
+    def getmaxyx(self):
+        return self.height, self.width
+    
+    def addnstr(self, y, x, text, n, attr=0):
+        self.writes.append((y, x, text[:n]))
+    
+    def timeout(self, delay):
+        pass
+    
+    def refresh(self):
+        pass
+
+
+class TestDashboard:
+    """Test cases for Dashboard state and drawing."""
+    
+    @pytest.fixture
+    def db_path(self, tmp_path):
+        """Create an initialized database with two habits."""
+        path = tmp_path / "test_habits.db"
+        with HabitDatabase(path) as db:
+            db.init_database()
+            db.add_habit("Read")
+            db.add_habit("Run")
+        return path
+    
+    @pytest.fixture
+    def dashboard(self, db_path):
+        """Create a dashboard over the test database."""
+        db = HabitDatabase(db_path)
+        yield Dashboard(db, days=7)
+        db.close()
+    
+    def test_initial_refresh_loads_all_habits(self, dashboard):
+        """Test that the first refresh loads every habit."""
+        changed = dashboard.refresh()
+        
+        assert [name for _, name in dashboard.habits] == ["Read", "Run"]
+        assert changed == {habit_id for habit_id, _ in dashboard.habits}
+    
+    def test_refresh_without_changes_is_noop(self, dashboard):
+        """Test that nothing is re-read when data_version is unchanged."""
+        dashboard.refresh()
+        
+        assert dashboard.refresh() == set()
+    
+    def test_refresh_picks_up_only_changed_habits(self, dashboard, db_path):
+        """Test that a commit from another connection marks only its habit."""
+        dashboard.refresh()
+        read_id = dashboard.habits[0][0]
+        
+        with HabitDatabase(db_path) as other:
+            other.mark_habit_done("Read")
+        
+        assert dashboard.refresh() == {read_id}
+        assert dashboard.done[read_id] == {date.today()}
+    
+    def test_refresh_picks_up_new_habits(self, dashboard, db_path):
+        """Test that added habits appear after a refresh."""
+        dashboard.refresh()
+        
+        with HabitDatabase(db_path) as other:
+            other.add_habit("Swim")
+            other.mark_habit_done("Swim")
+        dashboard.refresh()
+        
+        assert [name for _, name in dashboard.habits] == ["Read", "Run", "Swim"]
+        assert dashboard.done[dashboard.habits[2][0]] == {date.today()}
+    
+    def test_draw_skips_unchanged_cells(self, dashboard, db_path):
+        """Test that a redraw only writes cells whose text changed."""
+        screen = FakeScreen()
+        dashboard.refresh()
+        dashboard.draw(screen, top=0, selected=0)
+        screen.writes.clear()
+        
+        dashboard.draw(screen, top=0, selected=0)
+        assert screen.writes == []
+        
+        with HabitDatabase(db_path) as other:
+            other.mark_habit_done("Run")
+        dashboard.refresh()
+        dashboard.draw(screen, top=0, selected=0)
+        
+        assert {y for y, _, _ in screen.writes} == {2}
+        assert any(text == "✔" for _, _, text in screen.writes)
+    
+    def test_draw_highlights_selected_row(self, dashboard):
+        """Test that moving the selection rewrites only the two affected rows."""
+        screen = FakeScreen()
+        dashboard.refresh()
+        dashboard.draw(screen, top=0, selected=0)
+        screen.writes.clear()
+        
+        dashboard.draw(screen, top=0, selected=1)
+        
+        assert {y for y, _, _ in screen.writes} == {1, 2}
+    
+    def test_dashboard_needs_at_least_one_day(self, db_path):
+        """Test that a dashboard without days is rejected."""
+        with HabitDatabase(db_path) as db:
+            with pytest.raises(ValueError, match="at least one day"):
+                Dashboard(db, days=0)
+    
+    def test_draw_shows_message_in_status_line(self, dashboard):
+        """Test that a message replaces the key help until it is cleared."""
+        screen = FakeScreen()
+        dashboard.refresh()
+        dashboard.message = "Not marked done: database is locked"
+        dashboard.draw(screen, top=0, selected=0)
+        
+        assert screen.writes[-1][2].startswith("Not marked done: database is locked")
+        
+        dashboard.message = None
+        dashboard.draw(screen, top=0, selected=0)
+        
+        assert screen.writes[-1][2].startswith("q quit")
+    
+    def test_rate_matches_stats_for_schedules(self, db_path):
+        """Test that the rate column agrees with habit stats for scheduled habits."""
+        with HabitDatabase(db_path) as db:
+            db.add_habit("Gym", weekdays=0b0010101)
+            db.add_habit("Swim", weekly_target=2)
+            conn = db._get_connection()
+            for name in ("Gym", "Run", "Swim"):
+                habit = db.get_habit_by_name(name)
+                conn.executemany(
+                    "INSERT INTO entries (habit_id, entry_date) VALUES (?, ?)",
+                    [(habit.id, date.today() - timedelta(days=d)) for d in range(0, 17, 2)]
+                )
+            conn.commit()
+            expected = {row.name: row.rates[0] for row in db.get_stats(17).rows}
+            
+            dashboard = Dashboard(db, days=17)
+            dashboard.refresh()
+            
+            rates = {name: dashboard.rate(habit_id) for habit_id, name in dashboard.habits}
+            assert rates == pytest.approx(expected)
+            assert rates["Read"] == 0.0
+    
+    def test_marking_removed_habit_shows_error(self, db_path):
+        """Test that 'd' on a habit removed by another process keeps the dashboard open."""
+        screen = FakeScreen()
+        keys = iter([ord("d"), ord("q")])
+        
+        def getch():
+            key = next(keys)
+            if key == ord("d"):
+                with HabitDatabase(db_path) as other:
+                    other.remove_habits(["Read"])
+            return key
+        
+        screen.getch = getch
+        with HabitDatabase(db_path) as db, patch('habit.tui.curses.curs_set'):
+            run(screen, db)
+        
+        assert any(text.startswith("Not marked done: Habit 'Read' not found")
+                   for _, _, text in screen.writes)